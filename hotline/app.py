@@ -1,14 +1,20 @@
 import sys
+from concurrent.futures import CancelledError, Future
+from time import perf_counter_ns
+from timeit import default_timer
 
-from hotline import styles
+from hotline import metrics, stream, styles
 from hotline.command import Command
 from hotline.constant import flags
 from hotline.contexts import best_context
-from hotline.history import History, ModeCommand
+from hotline.frecency import Frecency
+from hotline.history import History, ModeCommand, mode_name
+from hotline.jobs import JobPool
 from hotline.mode import Mode
-from hotline.utils import execute_in_main_thread
+from hotline.task import outcome
+from hotline.utils import Executor
 from hotline.vendor.qtpy import QtWidgets
-from hotline.widgets import Dialog
+from hotline.widgets import Dialog, DialogPool
 
 
 class HotlineMode(Mode):
@@ -22,12 +28,30 @@ class HotlineMode(Mode):
     def toggle_pin(self):
         self.app.ui.pinned = not self.app.ui.pinned
 
+    def export_metrics(self, text):
+        """Print text to the console and copy it to the clipboard"""
+        QtWidgets.QApplication.clipboard().setText(text)
+        print(text)
+        return self.show_console()
+
+    def metrics_json(self):
+        return self.export_metrics(metrics.registry.to_json(indent=2))
+
+    def metrics_prometheus(self):
+        return self.export_metrics(metrics.registry.to_prometheus())
+
+    def reset_metrics(self):
+        metrics.registry.reset()
+
     @property
     def commands(self):
         return [
             Command("Toggle Pin", self.toggle_pin),
             Command("Show Console", self.show_console),
             Command("Show Settings", self.show_console),
+            Command("Metrics JSON", self.metrics_json),
+            Command("Metrics Prometheus", self.metrics_prometheus),
+            Command("Reset Metrics", self.reset_metrics),
         ]
 
     def execute(self, command):
@@ -35,13 +59,36 @@ class HotlineMode(Mode):
 
 
 class HotlineStream(object):
-    def __init__(self, app):
+    """File-like object writing to the Hotline console from any thread.
+
+    Messages are queued on the console and rendered by the main thread, and
+    tagged with the Invocation captured in the writing thread.
+
+    :param app: Hotline instance
+    :param echo: optional stream that also receives every message
+    """
+
+    def __init__(self, app, echo=None):
         self.app = app
+        self.echo = echo
 
     def write(self, message):
-        sys.__stdout__.write(message)
+        if self.echo:
+            self.echo.write(message)
+        if self.app.ui:
+            self.app.ui.console.write(message, stream.current_invocation())
+
+    def write_result(self, result):
+        """Queue a command result, formatted later in the main thread"""
+
         if self.app.ui:
-            self.app.ui.console.write(message)
+            self.app.ui.console.write(
+                stream.LazyText(result), stream.current_invocation()
+            )
+
+    def flush(self):
+        if self.echo:
+            self.echo.flush()
 
 
 class Hotline(object):
@@ -50,9 +97,29 @@ class Hotline(object):
         if style:
             context.style = getattr(styles, style)
         self.context = context(self)
-        self.stream = HotlineStream(self)
-        self.history = History()
+        self.stream = HotlineStream(self, sys.__stdout__)
+        self.error_stream = HotlineStream(self, sys.__stderr__)
+        self.history = History(context=self.context.name)
+        self.frecency = Frecency(
+            context=self.context.name, on_load=self._on_frecency_load
+        )
+        self.jobs = JobPool(self.context.max_jobs, self.on_jobs_changed)
         self.ui = None
+        self._mode_names = {}
+        self._mode_labels = {}
+        self._index_modes(*self.context.modes)
+        self._search = None
+        self._search_results = []
+        self._search_boosts = {}
+
+    def capture(self, mode, command, invocation=None):
+        """Capture stdout and stderr of the calling thread in the console
+
+        :param invocation: Invocation to continue, a new one by default
+        """
+
+        invocation = invocation or stream.Invocation(mode, command)
+        return stream.capture(self.stream, self.error_stream, invocation)
 
     def init_ui(self):
         if self.ui:
@@ -68,10 +135,27 @@ class Hotline(object):
         self.ui.hk_alt_f4.activated.connect(self.exit)
         self.ui.hk_ctrl_up.activated.connect(self.on_history_prev)
         self.ui.hk_ctrl_dn.activated.connect(self.on_history_next)
+        self.ui.hk_ctrl_r.activated.connect(self.on_history_search)
+        self.ui.hk_ctrl_shift_c.activated.connect(self.on_cancel_job)
         self.ui.accepted.connect(self.on_accept)
         self.ui.rejected.connect(self.on_reject)
+        self.ui.input_field.textChanged.connect(self.on_text_changed)
         self.refresh()
 
+        self.dialogs = DialogPool(self.context.parent, self.context.style)
+        self.dialogs.warm()
+
+    def set_style(self, style):
+        """Restyle the palette and the pooled prompt Dialogs
+
+        :param style: name of a stylesheet in hotline.styles
+        """
+
+        self.context.style = getattr(styles, style)
+        if self.ui:
+            self.ui.set_style(self.context.style)
+            self.dialogs.set_style(self.context.style)
+
     def exit(self):
         if self._standalone:
             self._event_loop.setQuitOnLastWindowClosed(True)
@@ -94,7 +178,8 @@ class Hotline(object):
 
     def show(self):
         if self.ui:
-            execute_in_main_thread(self.ui.show, *self._show_args())
+            # Hotkeys can fire repeatedly, only the latest show is executed
+            Executor.coalesce("show", self._show, *self._show_args())
             return
 
         self._standalone = QtWidgets.QApplication.instance() is None
@@ -105,17 +190,50 @@ class Hotline(object):
             self._event_loop = QtWidgets.QApplication.instance()
 
         self.init_ui()
-        execute_in_main_thread(self.ui.show, *self._show_args())
+        Executor.coalesce("show", self._show, *self._show_args())
 
         if self._standalone:
             sys.exit(self._event_loop.exec_())
 
+    def _show(self, anim_type=None, lefttop=None):
+        # Runs in the main thread, show may be called from a hotkey thread
+        self.activate_mode()
+        self.ui.show(anim_type, lefttop)
+
     def refresh(self):
+        self._end_history_search()
         mode = self.get_mode()
         self.ui.input_field.setPlaceholderText(mode.prompt)
         self.ui.input_field.clear()
-        self.ui.mode_button.setText(mode.label)
-        self.ui.commandlist.items = [c.name for c in mode.commands]
+        self._update_mode_button()
+        self.ui.commandlist.boosts = self.frecency.boosts(mode)
+        self.ui.commandlist.items = mode.provider.names
+        self.activate_mode()
+
+    def activate_mode(self):
+        """Let the active mode snapshot state, then update its preview"""
+
+        if self._search is not None:
+            return
+        self.get_mode().activate()
+        self.on_text_changed(self.ui.input_field.text())
+
+    def on_text_changed(self, text):
+        """Show the active mode's preview of text, if it has one"""
+
+        if self._search is not None:
+            return
+
+        mode = self.get_mode()
+        start = perf_counter_ns()
+        rows = mode.preview(text)
+        commandlist = self.ui.commandlist
+        if rows is not None:
+            commandlist.preview(rows)
+            metrics.registry.observe("preview", perf_counter_ns() - start, mode)
+        elif commandlist.previewing:
+            commandlist.items = mode.provider.names
+            commandlist.request_filter(text)
 
     def on_history_prev(self):
         text = self.ui.text()
@@ -123,20 +241,92 @@ class Hotline(object):
         if is_partial_command:
             self.history.insert(1, ModeCommand(self.get_mode(), text))
 
-        item = self.history.prev()
-        if item is None:
-            return
-        self.set_mode(item.mode)
-        self.refresh()
-        self.ui.input_field.setText(item.command)
+        # Entries of modes not loaded in this session are skipped
+        shown = self.history.index
+        while True:
+            index = self.history.index
+            item = self.history.prev()
+            if item is None or self.history.index == index:
+                self.history.index = shown
+                return
+            if self._show_history(item):
+                return
 
     def on_history_next(self):
-        item = self.history.next()
-        if item is None:
-            self.ui.input_field.setText("")
+        while True:
+            item = self.history.next()
+            if item is None:
+                self.ui.input_field.setText("")
+                return
+            if self._show_history(item):
+                return
+
+    def _show_history(self, item):
+        """Show a history item in its mode, False if the mode is not loaded"""
+
+        mode = item.mode
+        if not isinstance(mode, Mode):
+            mode = self._find_mode(mode)
+        if not any(m is mode for m in self.context.modes):
+            return False
+        current = self.get_mode()
+        self.set_mode(mode)
+        if self.get_mode() is current:
+            # set_mode only refreshes when the mode changes
+            self.refresh()
+        self.ui.input_field.setText(item.command)
+        return True
+
+    def on_history_search(self):
+        """Search history for the input text, again selects an older match"""
+
+        if self._search is not None:
+            self.ui.commandlist.select_next()
             return
-        self.set_mode(item.mode)
-        self.refresh()
+
+        # Remember what to restore when the search is cancelled
+        self._search = ModeCommand(self.get_mode(), self.ui.input_field.text())
+        self.ui.commandlist.filtering = False
+        # Results are listed newest first, the mode's boosts would reorder them
+        self._search_boosts = self.ui.commandlist.boosts
+        self.ui.commandlist.boosts = {}
+        self.ui.mode_button.setText("History")
+        self.ui.input_field.setPlaceholderText("Search history")
+        self.ui.input_field.textChanged.connect(self.on_history_search_changed)
+        self.on_history_search_changed(self.ui.input_field.text())
+
+    def on_history_search_changed(self, text):
+        self._search_results = self.history.search(text.strip(" "))
+        self.ui.commandlist.items = [r.command for r in self._search_results]
+        self.ui.commandlist.setCurrentRow(0 if self._search_results else -1)
+
+    def _end_history_search(self):
+        if self._search is None:
+            return
+        search, self._search = self._search, None
+        self._search_results = []
+        self.ui.input_field.textChanged.disconnect(self.on_history_search_changed)
+        self.ui.commandlist.filtering = True
+        self.ui.commandlist.boosts = self._search_boosts
+        return search
+
+    def _accept_history_search(self):
+        row = self.ui.commandlist.currentRow()
+        if row >= 0:
+            # Map the row back to the result it shows
+            row = self.ui.commandlist.matches[row].index
+        results = self._search_results
+        search = self._end_history_search()
+        item = results[row] if 0 <= row < len(results) else search
+        mode = self.get_mode()
+        try:
+            self.set_mode(item.mode)
+        except Exception:
+            # The mode is not available in this session, stay in the current
+            pass
+        if self.get_mode() is mode:
+            # set_mode only refreshes when the mode changes
+            self.refresh()
         self.ui.input_field.setText(item.command)
 
     def on_prev_mode(self):
@@ -148,38 +338,170 @@ class Hotline(object):
         self.refresh()
 
     def on_accept(self):
-        result = self.execute(self.ui.text())
-        success = not isinstance(result, Exception)
+        if self._search is not None:
+            self._accept_history_search()
+            return
+
+        mode = self.get_mode()
+        text = self.ui.text()
+        start = default_timer()
+        result = self.execute(text)
+        if isinstance(result, Future) and not result.done():
+            # Threaded, generator and async commands finish later, the
+            # palette is free for the next command in the meantime
+            result.add_done_callback(
+                lambda future: Executor.execute(
+                    self._finish, mode, text, start, outcome(future), True
+                )
+            )
+            self._reset_input()
+            self.ui.hide()
+            return
+        if isinstance(result, Future):
+            result = outcome(result)
+        self._finish(mode, text, start, result)
+
+    def _finish(self, mode, text, start, result, background=False):
+        duration = default_timer() - start
+        success = not isinstance(result, BaseException)
         hide = success and result is not flags.DontHide
 
-        if not success:
+        if text:
+            self.history.add(ModeCommand(mode, text), duration, success)
+            # Free text input would only bloat the usage table
+            if success and mode.get_command(text) is not None:
+                self.frecency.record(mode, text)
+
+        if not success and not isinstance(result, CancelledError):
             self.ui.console.show()
 
+        self._update_mode_button()
+
+        if background:
+            return
+
         if success:
-            self.history.add(ModeCommand(self.get_mode(), self.ui.text()))
-            self.ui.input_field.clear()
-            self.ui.commandlist.filter("")
+            self._reset_input()
 
         if hide:
             self.ui.hide()
 
+    def _on_frecency_load(self, mode):
+        # Called from the frecency thread once a mode's counts are read
+        Executor.execute(self._update_boosts, mode)
+
+    def _update_boosts(self, mode):
+        if self.ui is None or mode_name(self.get_mode()) != mode:
+            return
+        self.ui.commandlist.boosts = self.frecency.boosts(self.get_mode())
+        self.ui.commandlist.request_filter(self.ui.input_field.text())
+
+    def _reset_input(self):
+        self.ui.input_field.clear()
+        self.ui.commandlist.boosts = self.frecency.boosts(self.get_mode())
+        self.ui.commandlist.filter("")
+
+    def on_cancel_job(self):
+        """Cancel the most recently started threaded command"""
+
+        job = self.jobs.cancel()
+        if job is not None:
+            self.ui.console.write("Cancelling {}\n".format(job))
+
+    def on_jobs_changed(self, jobs):
+        if self.ui:
+            self._update_mode_button()
+
+    def _update_mode_button(self):
+        """Show the mode label and the progress of running jobs"""
+
+        if self._search is not None:
+            return
+
+        text = self.get_mode().label
+        jobs = self.jobs.jobs
+        tooltip = []
+        last = metrics.registry.last.get("execute")
+        if last:
+            tooltip.append(
+                "Last: [{}] {} {:.1f} ms".format(
+                    last.mode, last.command, last.ns / 1e6
+                )
+            )
+        for job in jobs:
+            line = str(job)
+            if job.percent is not None:
+                line += " {}%".format(job.percent)
+            if job.progress and job.progress[2]:
+                line += " " + job.progress[2]
+            tooltip.append(line)
+        if jobs:
+            percent = jobs[-1].percent
+            if percent is None:
+                text += " [{}]".format(len(jobs))
+            else:
+                text += " {}%".format(percent)
+        self.ui.mode_button.setText(text)
+        self.ui.mode_button.setToolTip("\n".join(tooltip))
+
     def on_reject(self):
+        if self._search is not None:
+            search = self._end_history_search()
+            self.refresh()
+            self.ui.input_field.setText(search.command)
+            return
         self.ui.hide()
 
-    def get_user_input(self, prompt=None, options=None):
-        """Get input from user using a modeless Hotline Dialog"""
+    def prompt(self, prompt=None, options=None, threaded=False):
+        """Ask the user for input without blocking.
+
+        Yield or await the result from a generator or async def command to
+        resume it with the input, or None when the user cancels.
+
+        Options may also be an iterator, a generator or a Future. The prompt
+        then appears immediately and options stream in while the user types,
+        see CommandList.stream.
+
+        :param prompt: placeholder text
+        :param options: list of options to choose from, or a lazy source
+        :param threaded: pull an iterator of options on a worker thread
+        :returns: hotline.task.Future
+        """
 
         self.ui.force_hide()
         pos = self.ui.pos()
-        dialog = Dialog(self.context.parent)
-        dialog.set_style(self.context.style)
+        dialog = self.dialogs.acquire()
         if prompt:
             dialog.input_field.setPlaceholderText(prompt)
-            dialog.input_field.clear()
-        if options:
+        if isinstance(options, (list, tuple)):
             dialog.commandlist.items = options
-        accepted = dialog.exec_(self.context.animation, (pos.x(), pos.y()))
-        user_input = dialog.text()
+        elif options is not None:
+            dialog.commandlist.stream(options, threaded)
+        future = dialog.ask(self.context.animation, (pos.x(), pos.y()))
+        future.add_done_callback(
+            lambda future: Executor.execute(self.dialogs.release, dialog)
+        )
+        return future
+
+    def get_user_input(self, prompt=None, options=None):
+        """Get input from user using a modeless Hotline Dialog
+
+        Blocks in a nested event loop, commands should prefer yielding
+        prompt from a generator.
+        """
+
+        self.ui.force_hide()
+        pos = self.ui.pos()
+        dialog = self.dialogs.acquire()
+        try:
+            if prompt:
+                dialog.input_field.setPlaceholderText(prompt)
+            if options:
+                dialog.commandlist.items = options
+            accepted = dialog.exec_(self.context.animation, (pos.x(), pos.y()))
+            user_input = dialog.text()
+        finally:
+            self.dialogs.release(dialog)
         if accepted:
             return user_input
 
@@ -196,38 +518,58 @@ class Hotline(object):
         if not name:
             return self.context.modes[0]
 
-        for mode in self.context.modes:
-            if mode.name == name or mode.label == name:
-                return mode
-
-        raise NameError("Can not find mode named: " + name)
+        mode = self._find_mode(name)
+        if mode is None:
+            raise NameError("Can not find mode named: " + name)
+        return mode
 
     def set_mode(self, mode):
         """Set active mode by name or Mode object"""
 
-        start = self.context.modes[0]
-        if mode == start:
+        if not isinstance(mode, Mode):
+            mode = self._find_mode(mode) or mode
+        # Modes compare equal by label, which several modes may share
+        modes = self.context.modes
+        index = next((i for i, m in enumerate(modes) if m is mode), None)
+        if index is None:
+            raise Exception("Could not find: {}".format(mode))
+        if not index:
             return
 
-        self.context.modes.rotate(-1)
-        while not self.context.modes[0] == start:
-            if mode == self.context.modes[0]:
-                self.refresh()
-                return
-            self.context.modes.rotate(-1)
-
-        raise Exception("Could not find: {}".format(mode))
+        modes.rotate(-index)
+        self.refresh()
 
     def set_modes(self, *modes):
         """Set available self.context.modes"""
 
+        for mode in self.context.modes:
+            mode.close()
         self.context.modes.clear()
+        self._mode_names.clear()
+        self._mode_labels.clear()
         self.add_modes(*modes)
 
     def add_modes(self, *modes):
         """Add mode"""
 
-        self.context.modes.extend([m(self) for m in modes])
+        modes = [m(self) for m in modes]
+        self.context.modes.extend(modes)
+        self._index_modes(*modes)
+
+    def _index_modes(self, *modes):
+        """Index modes by name and label, earlier modes take precedence"""
+
+        for mode in modes:
+            self._mode_names.setdefault(mode.name, mode)
+            self._mode_labels.setdefault(mode.label, mode)
+
+    def _find_mode(self, name):
+        """Return the mode named name, else the mode labeled name, else None"""
+
+        mode = self._mode_names.get(name)
+        if mode is None:
+            mode = self._mode_labels.get(name)
+        return mode
 
     def next_mode(self):
         """Rotate to the next mode"""
@@ -1,11 +1,22 @@
-from inspect import isgeneratorfunction
+from inspect import iscoroutinefunction, isgeneratorfunction
+from timeit import default_timer
 
 
 class Command(object):
-    def __init__(self, name, command, icon=None):
+    """A named command shown in the CommandList.
+
+    :param name: name shown to the user
+    :param command: callable, generator function or text passed to the Mode
+    :param icon: optional path to an icon
+    :param threaded: True to run off the GUI thread, None to use the Mode's
+        threaded attribute
+    """
+
+    def __init__(self, name, command, icon=None, threaded=None):
         self.name = name
         self.command = command
         self.icon = icon
+        self.threaded = threaded
 
     def __call__(self):
         return self.command()
@@ -20,3 +31,73 @@ class Command(object):
     @property
     def generator(self):
         return isgeneratorfunction(self.command)
+
+    @property
+    def coroutine(self):
+        return iscoroutinefunction(self.command)
+
+
+class CommandProvider(object):
+    """Memoizes a function that builds a list of Commands.
+
+    The list is built on first access and reused until it is invalidated or
+    its ttl expires. version increments every time the list is rebuilt so
+    consumers can tell when derived data is stale.
+
+    :param fn: callable returning a sequence of Command objects
+    :param ttl: seconds to keep the commands, None to keep them until
+        invalidated
+    :param clock: callable returning the current time in seconds
+    """
+
+    def __init__(self, fn, ttl=None, clock=default_timer):
+        self.fn = fn
+        self.ttl = ttl
+        self.clock = clock
+        self.version = 0
+        self._commands = None
+        self._names = None
+        self._index = None
+        self._built = 0
+
+    def expired(self):
+        if self._commands is None:
+            return True
+        if self.ttl is None:
+            return False
+        return self.clock() - self._built > self.ttl
+
+    def invalidate(self):
+        """Rebuild the commands on next access"""
+
+        self._commands = None
+        self._names = None
+        self._index = None
+
+    @property
+    def commands(self):
+        if self.expired():
+            self._commands = list(self.fn() or [])
+            self._names = None
+            self._index = None
+            self._built = self.clock()
+            self.version += 1
+        return self._commands
+
+    @property
+    def names(self):
+        commands = self.commands
+        if self._names is None:
+            self._names = [command.name for command in commands]
+        return self._names
+
+    def get(self, name):
+        """Return the first Command named name or None"""
+
+        commands = self.commands
+        if self._index is None:
+            index = {}
+            for command in commands:
+                index.setdefault(command.name, command)
+            self._index = index
+        return self._index.get(name)
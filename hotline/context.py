@@ -1,14 +1,20 @@
+import sys
 import traceback
 from abc import abstractmethod
 from collections import deque
+from concurrent.futures import CancelledError, Future
 
-from hotline import styles
+from hotline import metrics, stream, styles
 from hotline.constant import flags
+from hotline.task import outcome
+from hotline.utils import Executor
 
 
 class Context(object):
     animation = "slide"
     position = "center"
+    # Number of threaded commands that may run at once
+    max_jobs = 4
 
     def __init__(self, app):
         self.app = app
@@ -23,17 +29,56 @@ class Context(object):
     def execute(self, command, mode=None):
         mode = mode or self.modes[0]
 
+        # perf_counter_ns when dispatch started and when the command started
+        timing = [metrics.perf_counter_ns(), None]
         self.before_execute(mode, command)
 
-        try:
-            result = mode(command)
-            if result and result not in flags._list:
-                print(result)
-        except Exception as e:
-            result = e
-            traceback.print_exc()
+        invocation = stream.Invocation(mode, command)
+        if mode.is_threaded(command):
+            result = self.app.jobs.submit(
+                str(invocation), self._run, mode, command, invocation, timing
+            )
+        else:
+            try:
+                result = self._run(mode, command, invocation, timing)
+            except Exception as e:
+                result = e
+
+        if isinstance(result, Future) and not result.done():
+            # Threaded, generator and async commands finish later
+            result.add_done_callback(
+                lambda future: Executor.execute(
+                    self._finish, mode, command, invocation, outcome(future), timing
+                )
+            )
+            return result
+
+        if isinstance(result, Future):
+            result = outcome(result)
+        return self._finish(mode, command, invocation, result, timing)
+
+    def _run(self, mode, command, invocation, timing):
+        timing[1] = metrics.perf_counter_ns()
+        metrics.registry.observe("dispatch", timing[1] - timing[0], mode, command)
+        with self.app.capture(mode, command, invocation):
+            return mode(command)
+
+    def _finish(self, mode, command, invocation, result, timing):
+        start = timing[1] or timing[0]
+        metrics.registry.observe(
+            "execute", metrics.perf_counter_ns() - start, mode, command
+        )
+
+        with self.app.capture(mode, command, invocation):
+            if isinstance(result, CancelledError):
+                print("Cancelled", file=sys.stderr)
+            elif isinstance(result, BaseException):
+                traceback.print_exception(type(result), result, result.__traceback__)
+            elif result and result not in flags._list:
+                self.app.stream.write_result(result)
 
         self.after_execute(mode, command, result)
+        return result
 
     def after_execute(self, mode, command, result):
         """Called before every command is executed in this context."""
@@ -7,7 +7,8 @@ from hotline import styles
 from hotline.command import Command
 from hotline.context import Context
 from hotline.mode import Mode
-from hotline.renamer import Renamer
+from hotline.nameindex import NameIndex
+from hotline.renamer import RenamePreview, Renamer
 from hotline.vendor.qtpy import QtCore, QtGui, QtWidgets
 
 # Py3 Compat
@@ -190,25 +191,47 @@ class Mel(Mode):
         mel.eval(command)
 
 
+def selected_objects():
+    """MObjects of the active selection"""
+
+    from maya.api import OpenMaya
+
+    nodes = OpenMaya.MGlobal.getActiveSelectionList()
+    return [nodes.getDependNode(i) for i in range(nodes.length())]
+
+
 class Rename(Mode):
 
     name = "Rename"
     label = "REN"
     commands = []
     prompt = "rename tokens"
+    _preview = None
 
-    def execute(self, command):
+    def activate(self):
         from maya import cmds
-        from maya.api import OpenMaya
+
+        from hotline.contexts import maya_rename
+
+        names = maya_rename.node_names(selected_objects())
+        self._preview = RenamePreview(names, cmds.objExists)
+
+    def preview(self, text):
+        if self._preview is None or not len(self._preview):
+            return
+        return self._preview.update(text)
+
+    def execute(self, command):
+        from hotline.contexts import maya_rename
 
         renamer = Renamer(command)
 
-        nodes = OpenMaya.MGlobal.getActiveSelectionList()
-        for i in range(nodes.length()):
-            full_path = nodes.getSelectionStrings(i)[0]
-            short_name = full_path.split("|")[-1]
-            new_name = renamer.rename(short_name, i)
-            cmds.rename(full_path, new_name)
+        objects = selected_objects()
+        names = maya_rename.node_names(objects)
+        maya_rename.rename(objects, renamer.rename_all(names), names)
+
+        # Preview the renamed selection if hotline stays open
+        self.activate()
 
 
 class Connect(Mode):
@@ -227,7 +250,7 @@ class Connect(Mode):
         return 0
 
     def connect_pairs(self):
-        command = self.app.get_user_input(self.prompt)
+        command = yield self.app.prompt(self.prompt)
         if not command:
             return
 
@@ -248,7 +271,7 @@ class Connect(Mode):
                 pass
 
     def connect_one_to_many(self):
-        command = self.app.get_user_input(self.prompt)
+        command = yield self.app.prompt(self.prompt)
         if not command:
             return
 
@@ -268,7 +291,7 @@ class Connect(Mode):
                 pass
 
     def connect_many_to_one(self):
-        command = self.app.get_user_input(self.prompt)
+        command = yield self.app.prompt(self.prompt)
         if not command:
             return
 
@@ -333,6 +356,32 @@ class Node(Mode):
     label = "NODE"
     prompt = "node type"
 
+    def __init__(self, app):
+        super(Node, self).__init__(app)
+
+        from maya.api import OpenMaya
+
+        # Node types change when plugins are loaded or unloaded
+        self._callbacks = [
+            OpenMaya.MSceneMessage.addStringArrayCallback(
+                OpenMaya.MSceneMessage.kAfterPluginLoad,
+                self._on_plugins_changed,
+            ),
+            OpenMaya.MSceneMessage.addStringArrayCallback(
+                OpenMaya.MSceneMessage.kAfterPluginUnload,
+                self._on_plugins_changed,
+            ),
+        ]
+
+    def close(self):
+        from maya.api import OpenMaya
+
+        OpenMaya.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def _on_plugins_changed(self, *args):
+        self.invalidate_commands()
+
     @property
     def commands(self):
         from maya import cmds
@@ -378,28 +427,194 @@ class Node(Mode):
             cmds.rename(node, name)
 
 
-def ls_regex(reg):
-    from maya import cmds
+class SceneIndex(object):
+    """NameIndex of the scene's nodes, kept current by callbacks.
 
-    p = re.compile(reg)
-    nodes = []
-    for node in cmds.ls(long=True):
-        name = node.split("|")[-1]
-        if p.match(name):
-            nodes.append(node)
-    return nodes
+    The index is built on the first query. Afterwards MDGMessage node added
+    and removed callbacks and an MNodeMessage name changed callback update
+    it as nodes change. Opening or creating a scene drops the index and its
+    node callbacks, so clearing the old scene costs nothing, and the next
+    query rebuilds it.
 
+    Nodes are keyed by integers. MObjectHandle.hashCode is not unique, so
+    it only picks a bucket of handles that are compared by MObject.
+    """
 
-def ls_regex_filter(reg):
-    from maya import cmds
+    def __init__(self):
+        from maya.api import OpenMaya
+
+        self.index = NameIndex()
+        self.handles = {}
+        self._buckets = {}
+        self._next_key = 0
+        self.built = False
+        self._node_callbacks = []
+        self._callbacks = [
+            OpenMaya.MSceneMessage.addCallback(
+                OpenMaya.MSceneMessage.kBeforeNew, self._on_scene_changed
+            ),
+            OpenMaya.MSceneMessage.addCallback(
+                OpenMaya.MSceneMessage.kBeforeOpen, self._on_scene_changed
+            ),
+        ]
+
+    def build(self):
+        from maya.api import OpenMaya
+
+        self.reset()
+        nodes = OpenMaya.MItDependencyNodes()
+        while not nodes.isDone():
+            self._add(nodes.thisNode())
+            nodes.next()
+        self._node_callbacks = [
+            OpenMaya.MDGMessage.addNodeAddedCallback(self._on_added, "dependNode"),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(
+                self._on_removed, "dependNode"
+            ),
+            OpenMaya.MNodeMessage.addNameChangedCallback(
+                OpenMaya.MObject.kNullObj, self._on_renamed
+            ),
+        ]
+        self.built = True
+
+    def reset(self):
+        """Drop the index until the next query"""
+
+        from maya.api import OpenMaya
+
+        if self._node_callbacks:
+            OpenMaya.MMessage.removeCallbacks(self._node_callbacks)
+        self._node_callbacks = []
+        self.index.clear()
+        self.handles.clear()
+        self._buckets.clear()
+        self.built = False
+
+    def close(self):
+        from maya.api import OpenMaya
+
+        self.reset()
+        OpenMaya.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def key(self, obj):
+        """Key of obj in the index or None"""
+
+        from maya.api import OpenMaya
+
+        bucket = self._buckets.get(OpenMaya.MObjectHandle(obj).hashCode(), ())
+        for key in bucket:
+            handle = self.handles[key]
+            if handle.isValid() and handle.object() == obj:
+                return key
+
+    def _add(self, obj):
+        from maya.api import OpenMaya
+
+        key = self.key(obj)
+        if key is None:
+            handle = OpenMaya.MObjectHandle(obj)
+            key = self._next_key
+            self._next_key += 1
+            self.handles[key] = handle
+            self._buckets.setdefault(handle.hashCode(), []).append(key)
+        self.index.add(key, OpenMaya.MFnDependencyNode(obj).name())
+
+    def _on_added(self, obj, client_data):
+        self._add(obj)
+
+    def _on_removed(self, obj, client_data):
+        from maya.api import OpenMaya
+
+        key = self.key(obj)
+        if key is None:
+            return
+        code = OpenMaya.MObjectHandle(obj).hashCode()
+        bucket = self._buckets[code]
+        bucket.remove(key)
+        if not bucket:
+            del self._buckets[code]
+        del self.handles[key]
+        self.index.remove(key)
+
+    def _on_renamed(self, obj, previous_name, client_data):
+        self._add(obj)
+
+    def _on_scene_changed(self, client_data):
+        self.reset()
+
+    def match(self, pattern, among=None):
+        """Keys of the nodes whose short name matches pattern"""
+
+        if not self.built:
+            self.build()
+        return self.index.match(pattern, among=among)
+
+    def paths(self, keys):
+        """Long names of the nodes of keys, every path of instanced nodes"""
 
-    p = re.compile(reg)
-    nodes = []
-    for node in cmds.ls(sl=True, long=True):
-        name = node.split("|")[-1]
-        if p.match(name):
-            nodes.append(node)
-    return nodes
+        from maya.api import OpenMaya
+
+        paths = []
+        for key in keys:
+            handle = self.handles.get(key)
+            if handle is None or not handle.isValid():
+                continue
+            obj = handle.object()
+            if obj.hasFn(OpenMaya.MFn.kDagNode):
+                paths.extend(
+                    path.fullPathName() for path in OpenMaya.MDagPath.getAllPathsTo(obj)
+                )
+            else:
+                paths.append(OpenMaya.MFnDependencyNode(obj).name())
+        return paths
+
+
+_scene_index = None
+
+
+def scene_index():
+    """The shared SceneIndex"""
+
+    global _scene_index
+    if _scene_index is None:
+        _scene_index = SceneIndex()
+    return _scene_index
+
+
+def close_scene_index():
+    """Remove the shared SceneIndex and its callbacks"""
+
+    global _scene_index
+    if _scene_index is not None:
+        _scene_index.close()
+        _scene_index = None
+
+
+def ls_regex(reg):
+    index = scene_index()
+    return index.paths(index.match(reg))
+
+
+def ls_regex_filter(reg):
+    from maya.api import OpenMaya
+
+    index = scene_index()
+    if not index.built:
+        index.build()
+    nodes = OpenMaya.MGlobal.getActiveSelectionList()
+    keys = [index.key(nodes.getDependNode(i)) for i in range(nodes.length())]
+    matches = set(index.match(reg, among=keys))
+    paths = []
+    for i, key in enumerate(keys):
+        if key not in matches:
+            continue
+        obj = nodes.getDependNode(i)
+        if obj.hasFn(OpenMaya.MFn.kDagNode):
+            paths.append(nodes.getDagPath(i).fullPathName())
+        else:
+            paths.append(OpenMaya.MFnDependencyNode(obj).name())
+    return paths
 
 
 def ls(pattern):
@@ -426,32 +641,35 @@ class Select(Mode):
     label = "SEL"
     prompt = "glob pattern"
 
+    def close(self):
+        close_scene_index()
+
     def add(self):
-        pattern = self.app.get_user_input("glob pattern")
+        pattern = yield self.app.prompt("glob pattern")
         if pattern is None:
             return
         return select(ls(pattern), add=True)
 
     def filter(self):
-        pattern = self.app.get_user_input("glob pattern")
+        pattern = yield self.app.prompt("glob pattern")
         if pattern is None:
             return
         return select(ls_filter(pattern))
 
     def regex_select(self):
-        pattern = self.app.get_user_input("regex pattern")
+        pattern = yield self.app.prompt("regex pattern")
         if pattern is None:
             return
         return select(ls_regex(pattern))
 
     def regex_add(self):
-        pattern = self.app.get_user_input("regex pattern")
+        pattern = yield self.app.prompt("regex pattern")
         if pattern is None:
             return
         return select(ls_regex(pattern), add=True)
 
     def regex_filter(self):
-        pattern = self.app.get_user_input("regex pattern")
+        pattern = yield self.app.prompt("regex pattern")
         if pattern is None:
             return
         return select(ls_regex_filter(pattern))
@@ -459,7 +677,7 @@ class Select(Mode):
     def type_select(self):
         from maya import cmds
 
-        pattern = self.app.get_user_input("node type")
+        pattern = yield self.app.prompt("node type")
         if pattern is None:
             return
         return select(
@@ -469,7 +687,7 @@ class Select(Mode):
     def type_add(self):
         from maya import cmds
 
-        pattern = self.app.get_user_input("node type")
+        pattern = yield self.app.prompt("node type")
         if pattern is None:
             return
         return select(
@@ -480,7 +698,7 @@ class Select(Mode):
     def type_filter(self):
         from maya import cmds
 
-        pattern = self.app.get_user_input("node type")
+        pattern = yield self.app.prompt("node type")
         if pattern is None:
             return
         return select(
@@ -0,0 +1,188 @@
+"""Rename many Maya nodes in one undoable step.
+
+rename plans the new names with renamer.plan_renames, then applies the plan
+with a single MDagModifier through the hotlineRename command. Nodes are
+tracked by MObjectHandle, so renaming a parent never invalidates the nodes
+below it, and undo restores every name at once.
+
+This module is also the Maya plugin registering hotlineRename, rename loads
+it on first use.
+"""
+import os
+
+from maya import cmds
+from maya.api import OpenMaya
+
+from hotline.renamer import plan_renames
+
+__all__ = [
+    "node_names",
+    "rename",
+]
+
+# Plan handed from rename to the hotlineRename command
+_pending = None
+
+
+def maya_useNewAPI():
+    pass
+
+
+class HotlineRename(OpenMaya.MPxCommand):
+    """Apply the pending rename plan with an MDagModifier"""
+
+    name = "hotlineRename"
+
+    def __init__(self):
+        super(HotlineRename, self).__init__()
+        self.modifier = None
+
+    @staticmethod
+    def creator():
+        return HotlineRename()
+
+    def doIt(self, args):
+        # Maya loads this file as a plugin under another module name, the
+        # plan is set on the hotline.contexts module
+        from hotline.contexts import maya_rename
+
+        self.modifier = OpenMaya.MDagModifier()
+        for handle, name in maya_rename._pending or []:
+            if handle.isValid():
+                self.modifier.renameNode(handle.object(), name)
+        self.redoIt()
+
+    def redoIt(self):
+        self.modifier.doIt()
+
+    def undoIt(self):
+        self.modifier.undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    OpenMaya.MFnPlugin(plugin).registerCommand(
+        HotlineRename.name, HotlineRename.creator
+    )
+
+
+def uninitializePlugin(plugin):
+    OpenMaya.MFnPlugin(plugin).deregisterCommand(HotlineRename.name)
+
+
+def load():
+    """Load this module as a Maya plugin"""
+
+    path = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+    name = os.path.basename(path)
+    if not cmds.pluginInfo(name, query=True, loaded=True):
+        cmds.loadPlugin(path, quiet=True)
+
+
+class Scopes(object):
+    """Name scopes of nodes, the parents of DAG nodes and the scene for DG
+    nodes, and the names taken in them.
+
+    A DAG node's name must be free under every parent of an instanced node
+    and must not be taken by a DG node, whose names are unique in their
+    namespace.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._count = 0
+        self._parents = {}
+        self._children = {}
+        self._dg = {}
+
+    def _key(self, obj):
+        """Unique key of obj, MObjectHandle.hashCode may collide"""
+
+        bucket = self._buckets.setdefault(OpenMaya.MObjectHandle(obj).hashCode(), [])
+        for other, key in bucket:
+            if other == obj:
+                return key
+        key = self._count
+        self._count += 1
+        bucket.append((obj, key))
+        return key
+
+    def scope(self, obj):
+        if not obj.hasFn(OpenMaya.MFn.kDagNode):
+            return
+        node = OpenMaya.MFnDagNode(obj)
+        parent = node.parent(0)
+        key = self._key(parent)
+        parents = self._parents.get(key)
+        if parents is None:
+            parents = self._parents[key] = {key: parent}
+        # Instances share the scope of their first parent, their other
+        # parents are checked too
+        for i in range(1, node.parentCount()):
+            parent = node.parent(i)
+            parents.setdefault(self._key(parent), parent)
+        return key
+
+    def exists(self, name, scope):
+        if scope is None:
+            return cmds.objExists(name)
+
+        for key, parent in self._parents[scope].items():
+            if name in self._child_names(key, parent):
+                return True
+        return self._dg_exists(name)
+
+    def _child_names(self, key, parent):
+        names = self._children.get(key)
+        if names is None:
+            parent = OpenMaya.MFnDagNode(parent)
+            names = self._children[key] = set(
+                OpenMaya.MFnDependencyNode(parent.child(i)).name()
+                for i in range(parent.childCount())
+            )
+        return names
+
+    def _dg_exists(self, name):
+        if name not in self._dg:
+            # Most new names are free, objExists answers those quickly
+            self._dg[name] = cmds.objExists(name) and len(cmds.ls(name)) > len(
+                cmds.ls(name, dagObjects=True)
+            )
+        return self._dg[name]
+
+
+def node_names(objects):
+    """Short names of MObjects"""
+
+    return [OpenMaya.MFnDependencyNode(obj).name() for obj in objects]
+
+
+def rename(objects, new_names, names=None):
+    """Rename MObjects to new_names as one undoable command.
+
+    :param objects: MObjects to rename
+    :param new_names: wanted names, suffixed where they would collide
+    :param names: current names of objects, looked up by default
+    :returns: list of (index, name) renames applied
+    """
+
+    global _pending
+
+    names = names or node_names(objects)
+    handles = [OpenMaya.MObjectHandle(obj) for obj in objects]
+    scopes = Scopes()
+    plan = plan_renames(
+        names, new_names, scopes.exists, [scopes.scope(obj) for obj in objects]
+    )
+    if not plan:
+        return plan
+
+    load()
+    _pending = [(handles[i], name) for i, name in plan]
+    try:
+        cmds.hotlineRename()
+    finally:
+        _pending = None
+    return plan
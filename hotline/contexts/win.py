@@ -5,11 +5,47 @@ import os
 import shlex
 import sys
 
-from hotline import styles
+from hotline import stream, styles
 from hotline.command import Command
 from hotline.context import Context
+from hotline.jobs import current_job
 from hotline.mode import Mode
-from hotline.utils import new_process
+from hotline.utils import Process, new_process
+
+
+def console_writer(app):
+    """Returns a thread safe callable writing lines to the Hotline console,
+    tagged with the command executing in the calling thread."""
+
+    invocation = stream.current_invocation()
+
+    def write(line):
+        app.ui.console.write(line, invocation)
+
+    return write
+
+
+def run_in_console(app, *cmd, **kwargs):
+    """Run a process writing its output to the Hotline console. Cancelling
+    the job running it kills the process.
+
+    Outside of a job, like on the GUI thread, only waits timeout seconds.
+    The process keeps running and writing to the console after that.
+
+    :param timeout: seconds to wait outside of a job, 2 by default
+    :returns: process returncode or None when it is 0 or still running
+    """
+
+    write = console_writer(app)
+    process = Process(*cmd, on_stdout=write, on_stderr=write).start()
+    job = current_job()
+    if job:
+        job.on_cancel(process.cancel)
+        return process.wait().returncode or None
+
+    result = process.wait(kwargs.get("timeout", 2))
+    if result:
+        return result.returncode or None
 
 
 def elevated():
@@ -23,6 +59,7 @@ class PowerShell(Mode):
     name = "PowerShell"
     label = "PS"
     prompt = "Powershell command"
+    threaded = True
 
     @property
     def commands(self):
@@ -40,7 +77,7 @@ class PowerShell(Mode):
             cmd.append("-Command")
             cmd.append(command)
 
-        print(new_process(*cmd))
+        return run_in_console(self.app, *cmd)
 
 
 class Cmd(Mode):
@@ -49,10 +86,10 @@ class Cmd(Mode):
     label = "CMD"
     commands = []
     prompt = "batch command"
+    threaded = True
 
     def execute(self, command):
-        cmd = ["cmd", "/C", command]
-        print(new_process(cmd, shell=True))
+        return run_in_console(self.app, "cmd", "/C", command)
 
 
 class Python(Mode):
@@ -76,6 +113,8 @@ class Run(Mode):
 
     name = "Run"
     label = "RUN"
+    # Rescan the Start Menu and PATH every few minutes
+    commands_ttl = 300
 
     @property
     def commands(self):
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Usage statistics blending how often and how recently commands are used.
+
+Each use adds 1 to a command's score, and scores halve every half_life
+seconds. Only the score and the time it was last updated are stored, so
+recording a use is O(1). Rows decayed below min_score are deleted.
+"""
+import math
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from hotline.history import connect, default_path, mode_name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    context TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    command TEXT NOT NULL,
+    score REAL NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (context, mode, command)
+);
+"""
+
+
+def decay(score, then, now, half_life):
+    """Decay a score last updated at then to now"""
+
+    if now <= then:
+        return score
+    return score * 0.5 ** ((now - then) / half_life)
+
+
+def combine(a, b, half_life):
+    """Sum two (score, time) counts, decayed to the later time"""
+
+    if a[1] > b[1]:
+        a, b = b, a
+    return decay(a[0], a[1], b[1], half_life) + b[0], b[1]
+
+
+class Frecency(object):
+    """Exponentially decayed usage counts per (context, mode, command).
+
+    Counts for a mode are read from the database in the background the first
+    time that mode is queried, queries return the uses recorded so far until
+    then. Uses are applied in memory immediately and written by a single
+    background thread, which owns the database connection. The write decays
+    and increments the stored row in SQL, so several sessions can record uses
+    into the same database.
+
+    :param path: database path, defaults to the history database
+    :param context: name of the context uses are recorded in
+    :param half_life: Number of seconds for a score to halve
+    :param on_load: called with a mode name from the background thread once
+        its counts are read
+    """
+
+    # Rows decayed below this score are deleted when the database is opened
+    min_score = 0.05
+
+    def __init__(
+        self, path=None, context="", half_life=7 * 24 * 60 * 60, on_load=None
+    ):
+        self.path = path or default_path()
+        self.context = context
+        self.half_life = half_life
+        self.on_load = on_load
+        self._modes = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="HotlineFrecency"
+        )
+
+    @property
+    def db(self):
+        if self._db is None:
+            db = connect(self.path)
+            db.create_function("decay", 4, decay)
+            db.executescript(SCHEMA)
+            self._db = db
+            self.prune()
+        return self._db
+
+    def prune(self, now=None):
+        """Delete the rows of this context decayed below min_score
+
+        :param now: time to decay rows to, the latest use by default
+        """
+
+        try:
+            with self.db as db:
+                if now is None:
+                    now = db.execute(
+                        "SELECT MAX(time) FROM usage WHERE context = ?",
+                        (self.context,),
+                    ).fetchone()[0]
+                db.execute(
+                    "DELETE FROM usage "
+                    "WHERE context = ? AND decay(score, time, ?, ?) < ?",
+                    (self.context, now or 0, self.half_life, self.min_score),
+                )
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    def load(self, mode):
+        """Read the counts of mode in the background, once
+
+        :returns: Future of the read
+        """
+
+        mode = mode_name(mode)
+        with self._lock:
+            future = self._loading.get(mode)
+            if future is None:
+                self._modes.setdefault(mode, {})
+                # Read on the writer so uses recorded before loading are
+                # included, uses recorded later are added to the result
+                future = self._writer.submit(self._read, mode)
+                self._loading[mode] = future
+        return future
+
+    def _load(self, mode):
+        self.load(mode)
+        with self._lock:
+            return dict(self._modes[mode])
+
+    def _read(self, mode):
+        try:
+            rows = self.db.execute(
+                "SELECT command, score, time FROM usage "
+                "WHERE context = ? AND mode = ?",
+                (self.context, mode),
+            ).fetchall()
+        except sqlite3.Error:
+            traceback.print_exc()
+            rows = []
+
+        with self._lock:
+            counts = self._modes[mode]
+            for command, score, then in rows:
+                if command in counts:
+                    counts[command] = combine(
+                        (score, then), counts[command], self.half_life
+                    )
+                else:
+                    counts[command] = (score, then)
+        if self.on_load:
+            self.on_load(mode)
+
+    def record(self, mode, command, now=None):
+        """Record a use of command in mode
+
+        :returns: Future of the background write
+        """
+
+        mode = mode_name(mode)
+        now = now or time.time()
+        with self._lock:
+            counts = self._modes.get(mode)
+            if counts is not None:
+                counts[command] = combine(
+                    counts.get(command, (0, now)), (1, now), self.half_life
+                )
+        return self._writer.submit(self._write, mode, command, now)
+
+    def _write(self, mode, command, now):
+        try:
+            with self.db as db:
+                db.execute(
+                    "INSERT INTO usage (context, mode, command, score, time) "
+                    "VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (context, mode, command) DO UPDATE SET "
+                    "score = decay(score, time, excluded.time, ?) + 1, "
+                    "time = MAX(time, excluded.time)",
+                    (self.context, mode, command, now, self.half_life),
+                )
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    def score(self, mode, command, now=None):
+        """Return the decayed usage count of command in mode"""
+
+        counts = self._load(mode_name(mode))
+        if command not in counts:
+            return 0
+        score, then = counts[command]
+        return decay(score, then, now or time.time(), self.half_life)
+
+    def scores(self, mode, now=None):
+        """Return a dict of command name to decayed usage count"""
+
+        now = now or time.time()
+        counts = self._load(mode_name(mode))
+        return {
+            command: decay(score, then, now, self.half_life)
+            for command, (score, then) in counts.items()
+        }
+
+    def boosts(self, mode, weight=8, now=None):
+        """Return a dict of command name to fuzzy match score bonus
+
+        The bonus grows with the log of the usage count, so heavy use lifts a
+        command without drowning out the quality of the match. Bonuses are
+        rounded to whole points so they stay equal between refreshes and the
+        matcher keeps its cached results.
+        """
+
+        return {
+            command: round(weight * math.log(1 + score, 2))
+            for command, score in self.scores(mode, now).items()
+        }
+
+    def wait(self):
+        """Block until pending writes finish"""
+
+        self._writer.submit(lambda: None).result()
@@ -0,0 +1,489 @@
+"""Ranked fuzzy matching used to filter hotline's CommandList.
+
+Scoring is modeled after Sublime Text and fzf. Every query character must
+appear in the candidate in order. Matches earn bonuses for landing on word
+boundaries, camelCase humps and the start of the candidate, and for being
+contiguous. Gaps between matched characters are penalized.
+
+.. usage::
+
+    matcher = Matcher(["polyCube", "polyCylinder", "nurbsCube"])
+    for match in matcher.match("pc"):
+        print(match.text, match.score, match.spans)
+"""
+import bisect
+import re
+import threading
+from collections import namedtuple
+
+__all__ = [
+    "Match",
+    "Matcher",
+    "score",
+]
+
+Match = namedtuple("Match", "index text score spans")
+
+SCORE_MATCH = 16
+BONUS_BOUNDARY = 10
+BONUS_CAMEL = 8
+BONUS_CONSECUTIVE = 6
+BONUS_FIRST_CHAR = 6
+BONUS_PREFIX = 24
+BONUS_EXACT = 64
+PENALTY_GAP_START = 3
+PENALTY_GAP_EXTENSION = 1
+PENALTY_LEADING = 1
+MAX_LEADING_PENALTY = 12
+SEPARATORS = frozenset(" _-./\\|:#")
+
+
+def _key(text):
+    """Lowercase search key for text, one line long."""
+
+    return text.lower().replace("\n", " ")
+
+
+def _pattern(query):
+    """Compile a regex matching any line containing query as a subsequence.
+
+    Each step is written as [^\\nc]*c so the engine scans forward to the first
+    occurrence of c without backtracking.
+    """
+
+    parts = ["^"]
+    for char in query:
+        char = re.escape(char)
+        parts.append("[^\\n" + char + "]*" + char)
+    return re.compile("".join(parts), re.MULTILINE)
+
+
+def _positions(query, key, end):
+    """Walk backward from end to find the tightest window matching query."""
+
+    positions = [end]
+    pos = end
+    for char in reversed(query[:-1]):
+        pos = key.rfind(char, 0, pos)
+        positions.append(pos)
+    positions.reverse()
+    return positions
+
+
+def _score_positions(query, key, text, positions):
+    total = 0
+    prev = -1
+    for i, pos in enumerate(positions):
+        points = SCORE_MATCH
+        if pos == 0:
+            bonus = BONUS_BOUNDARY
+        else:
+            before = text[pos - 1]
+            if before in SEPARATORS:
+                bonus = BONUS_BOUNDARY
+            elif before.islower() and text[pos].isupper():
+                bonus = BONUS_CAMEL
+            elif before.isdigit() != text[pos].isdigit():
+                bonus = BONUS_CAMEL
+            else:
+                bonus = 0
+        if i == 0:
+            bonus += BONUS_FIRST_CHAR if bonus else 0
+        elif pos == prev + 1:
+            points += BONUS_CONSECUTIVE
+        else:
+            points -= PENALTY_GAP_START
+            points -= (pos - prev - 2) * PENALTY_GAP_EXTENSION
+        total += points + bonus
+        prev = pos
+
+    total -= min(positions[0] * PENALTY_LEADING, MAX_LEADING_PENALTY)
+    if key.startswith(query):
+        total += BONUS_PREFIX
+        if len(key) == len(query):
+            total += BONUS_EXACT
+    return total
+
+
+def _spans(positions):
+    """Merge matched positions into (start, end) spans."""
+
+    spans = []
+    start = prev = positions[0]
+    for pos in positions[1:]:
+        if pos != prev + 1:
+            spans.append((start, prev + 1))
+            start = pos
+        prev = pos
+    spans.append((start, prev + 1))
+    return spans
+
+
+def score(query, text):
+    """Score text against query.
+
+    :param query: search string, matched case-insensitively
+    :param text: candidate string
+    :returns: (score, spans) or None if text does not match
+    """
+
+    query = _key(query)
+    if not query:
+        return 0, []
+
+    key = _key(text)
+    pos = -1
+    for char in query:
+        pos = key.find(char, pos + 1)
+        if pos < 0:
+            return
+
+    positions = _positions(query, key, pos)
+    if len(key) != len(text):
+        text = key
+    return _score_positions(query, key, text, positions), _spans(positions)
+
+
+def _rank(match):
+    """Sort key of ranked Matches"""
+
+    return -match.score, len(match.text), match.index
+
+
+def _merge(ranked, added, key):
+    """Merge added into ranked, both sorted by key, bisecting ranked.
+
+    Entries of added rank after equal entries of ranked, like items appended
+    after them would.
+
+    :returns: (merged, rows) where rows are the positions of added in merged
+    """
+
+    merged = []
+    rows = []
+    prev = 0
+    for entry in added:
+        pos = bisect.bisect_right(ranked, key(entry), prev, key=key)
+        merged += ranked[prev:pos]
+        rows.append(len(merged))
+        merged.append(entry)
+        prev = pos
+    merged += ranked[prev:]
+    return merged, rows
+
+
+class _Unfiltered(object):
+    """Sequence of Matches for the first count items, built on access.
+
+    Items are in their original order unless order, a list of item indices,
+    is given. texts holds the item strings in the same order.
+    """
+
+    def __init__(self, items, order=None, boosts=None, count=None):
+        self.items = items
+        self.order = order
+        self.boosts = {} if boosts is None else boosts
+        self.count = len(items) if count is None else count
+
+    @property
+    def texts(self):
+        if self.order is None:
+            return self.items[: self.count]
+        items = self.items
+        return [items[i] for i in self.order]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if self.order is not None:
+            i = self.order[i]
+        text = self.items[i]
+        return Match(i, text, self.boosts.get(text, 0), [])
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+class _Segment(object):
+    """Newline joined keys of a run of items, scanned with one regex"""
+
+    def __init__(self, keys, start):
+        self.start = start
+        self.count = len(keys)
+        self.blob = "\n".join(keys)
+        self.offsets = {}
+        offset = 0
+        for i, key in enumerate(keys, start):
+            self.offsets[offset] = i
+            offset += len(key) + 1
+
+
+class _Index(object):
+    """Search keys for one list of items.
+
+    Matcher swaps whole indexes when its items change, so a match running on
+    a worker thread keeps a consistent view of the items it started with.
+
+    Extending appends to the lists of base in place, base only ever reads
+    its first count items. Keys are scanned in segments, a new segment
+    absorbing the previous one while they are of similar size, so a stream
+    of n items copies each key log n times.
+
+    Segments hold at most segment_size keys. A regex scan holds the GIL, so
+    a worker scanning one segment at a time lets the GUI thread run, and
+    checks for cancellation, between segments.
+    """
+
+    segment_size = 16384
+
+    def __init__(self, items, base=None):
+        items = list(items)
+        keys = [_key(item) for item in items]
+        if base is None or not base.count:
+            self.items = items
+            self.keys = keys
+            self.segments = []
+        else:
+            self.items = base.items
+            self.items += items
+            self.keys = base.keys
+            self.keys += keys
+            self.segments = list(base.segments)
+        self.count = len(self.items)
+        self.stack = []
+        self.unfiltered = None
+        self.lock = threading.Lock()
+
+        segments = self.segments
+        size = self.segment_size
+        start = self.count - len(keys)
+        for offset in range(0, len(keys), size):
+            segments.append(_Segment(keys[offset : offset + size], start + offset))
+        while len(segments) > 1:
+            first, last = segments[-2], segments[-1]
+            if first.count > last.count * 2 or first.count + last.count > size:
+                break
+            del segments[-2:]
+            end = last.start + last.count
+            segments.append(_Segment(self.keys[first.start : end], first.start))
+
+
+class Matcher(object):
+    """Ranks a list of strings against fuzzy queries.
+
+    Lowercase keys are computed once when items are assigned, so each query
+    only pays for a single regex scan over all candidates plus scoring of
+    the candidates that actually match.
+
+    Results are kept on a stack of queries where each query extends the one
+    below it. When the query grows only the previous survivors are rescanned,
+    and when it shrinks (backspace) the stacked results are reused.
+
+    boosts maps item strings to points added to their score, letting usage
+    statistics lift frequently used items. The empty query orders items by
+    descending boost.
+
+    :param items: list of strings to match against
+    :param max_stack: number of query results to keep for narrowing
+    :param chunk_size: number of candidates scored between cancellation checks
+    :param boosts: optional dict of item string to score bonus
+    """
+
+    def __init__(self, items=None, max_stack=32, chunk_size=2048, boosts=None):
+        self.max_stack = max_stack
+        self.chunk_size = chunk_size
+        self._boosts = boosts or {}
+        self.items = items or []
+
+    @property
+    def items(self):
+        return self._index.items
+
+    @items.setter
+    def items(self, value):
+        self._index = _Index(value)
+
+    def extend(self, items, query=None):
+        """Append items, reusing the keys of the current items.
+
+        Only the new items are matched against the stacked queries and
+        merged into their results.
+
+        :param items: strings to append
+        :param query: optional query whose results the caller shows
+        :returns: (matches, rows) for query, its updated results and the
+            positions of the new items in them, or None when nothing was
+            added or query has no stacked results
+        """
+
+        items = list(items)
+        if not items:
+            return
+        index = self._index
+        boosts = self._boosts
+        new = _Index(items, index)
+        added = range(index.count, new.count)
+        with index.lock:
+            stack = list(index.stack)
+            unfiltered = index.unfiltered
+
+        extended = {}
+        for stacked, results in stack:
+            matches = self._match(new, stacked, added, None, boosts)
+            results, rows = _merge(results, matches, _rank)
+            new.stack.append((stacked, results))
+            extended[stacked] = results, rows
+
+        if unfiltered is not None and unfiltered.boosts is boosts:
+            order = None
+            rows = list(added)
+            if unfiltered.order is not None:
+                items = new.items
+
+                def key(i):
+                    return -boosts.get(items[i], 0), i
+
+                order, rows = _merge(unfiltered.order, sorted(added, key=key), key)
+            new.unfiltered = _Unfiltered(new.items, order, boosts, new.count)
+            extended[""] = new.unfiltered, rows
+
+        self._index = new
+        if query is not None:
+            return extended.get(_key(query))
+
+    @property
+    def boosts(self):
+        return self._boosts
+
+    @boosts.setter
+    def boosts(self, value):
+        value = value or {}
+        if value == self._boosts:
+            return
+        self._boosts = value
+        # Stacked results were ranked with the old boosts
+        index = self._index
+        with index.lock:
+            index.stack = []
+            index.unfiltered = None
+
+    def __len__(self):
+        return self._index.count
+
+    def match(self, query, indices=None, cancelled=None):
+        """Return Matches for query sorted by descending score.
+
+        When indices is None, results are narrowed from the longest stacked
+        query that query extends. The returned list is shared with the stack
+        and must not be modified.
+
+        :param query: search string, matched case-insensitively
+        :param indices: optional subset of item indices to search
+        :param cancelled: optional callable polled between chunks, when it
+            returns True matching stops and None is returned
+        :returns: list of Match objects or None if cancelled
+        """
+
+        index = self._index
+        boosts = self._boosts
+        query = _key(query)
+        if not query:
+            if indices is None:
+                return self._unfiltered(index, boosts)
+            items = index.items
+            results = [Match(i, items[i], boosts.get(items[i], 0), []) for i in indices]
+            if boosts:
+                results.sort(key=lambda m: -m.score)
+            return results
+
+        if indices is not None:
+            return self._match(index, query, indices, cancelled, boosts)
+
+        with index.lock:
+            stack = index.stack
+            while stack and not query.startswith(stack[-1][0]):
+                stack.pop()
+            if stack:
+                if stack[-1][0] == query:
+                    return stack[-1][1]
+                indices = [m.index for m in stack[-1][1]]
+
+        results = self._match(index, query, indices, cancelled, boosts)
+        if results is None:
+            return
+
+        with index.lock:
+            if boosts is not self._boosts:
+                return results
+            stack = index.stack
+            while stack and not query.startswith(stack[-1][0]):
+                stack.pop()
+            if not stack or stack[-1][0] != query:
+                stack.append((query, results))
+            if len(stack) > self.max_stack:
+                stack.pop(0)
+        return results
+
+    def _unfiltered(self, index, boosts):
+        unfiltered = index.unfiltered
+        if unfiltered is None or unfiltered.boosts is not boosts:
+            order = None
+            if boosts:
+                items = index.items
+                order = sorted(
+                    range(index.count), key=lambda i: -boosts.get(items[i], 0)
+                )
+            unfiltered = _Unfiltered(index.items, order, boosts, index.count)
+            index.unfiltered = unfiltered
+        return unfiltered
+
+    def _match(self, index, query, indices, cancelled, boosts):
+        pattern = _pattern(query)
+        if indices is None:
+            hits = self._scan(index, pattern, cancelled)
+        else:
+            hits = self._scan_indices(index, pattern, indices)
+
+        items = index.items
+        keys = index.keys
+        chunk_size = self.chunk_size
+        results = []
+        for count, (i, end) in enumerate(hits):
+            if cancelled and not count % chunk_size and cancelled():
+                return
+            key = keys[i]
+            text = items[i]
+            positions = _positions(query, key, end)
+            if len(key) != len(text):
+                text = key
+            results.append(
+                Match(
+                    i,
+                    items[i],
+                    _score_positions(query, key, text, positions)
+                    + boosts.get(items[i], 0),
+                    _spans(positions),
+                )
+            )
+        if cancelled and cancelled():
+            return
+        results.sort(key=_rank)
+        return results
+
+    def _scan(self, index, pattern, cancelled=None):
+        for segment in index.segments:
+            if cancelled and cancelled():
+                return
+            offsets = segment.offsets
+            for m in pattern.finditer(segment.blob):
+                start = m.start()
+                yield offsets[start], m.end() - 1 - start
+
+    def _scan_indices(self, index, pattern, indices):
+        keys = index.keys
+        for i in indices:
+            m = pattern.match(keys[i])
+            if m:
+                yield i, m.end() - 1
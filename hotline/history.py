@@ -1,26 +1,363 @@
 # -*- coding: utf-8 -*-
+import os
+import sqlite3
+import threading
+import time
+import traceback
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 ModeCommand = namedtuple("ModeCommand", "mode command")
+HistoryEntry = namedtuple("HistoryEntry", "mode command timestamp duration success")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    context TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    command TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    duration REAL,
+    success INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS history_context ON history (context, success, id);
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    context TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    command TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    last_used REAL NOT NULL,
+    UNIQUE (context, mode, command)
+);
+CREATE INDEX IF NOT EXISTS commands_recent ON commands (context, last_used);
+CREATE TABLE IF NOT EXISTS grams (
+    gram TEXT NOT NULL,
+    command_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, command_id)
+) WITHOUT ROWID;
+"""
+
+
+def default_path():
+    """Path of the history database, $HOTLINE_HOME or ~/.hotline"""
+
+    root = os.environ.get("HOTLINE_HOME")
+    if not root:
+        root = os.path.join(os.path.expanduser("~"), ".hotline")
+    return os.path.join(root, "history.db")
+
+
+def connect(path):
+    """Open a SQLite database in WAL mode, falling back to memory on error"""
+
+    try:
+        if path != ":memory:":
+            root = os.path.dirname(path)
+            if root and not os.path.isdir(root):
+                os.makedirs(root)
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+    except (OSError, sqlite3.Error):
+        traceback.print_exc()
+        print("Hotline history is not persisted: " + path)
+        db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def mode_name(mode):
+    return getattr(mode, "name", mode)
+
+
+def trigrams(key):
+    """Set of the three character substrings of key"""
+
+    return {key[i : i + 3] for i in range(len(key) - 2)}
 
 
 class History(object):
-    def __init__(self):
-        self._list = [None]
+    """Command history persisted to a SQLite database in WAL mode.
+
+    The database is opened on first use and entries are fetched a page at a
+    time while navigating, so startup never reads the history. Several
+    processes may share one database; each write is a short transaction run
+    on a background thread, and reads wait for the writes before them.
+
+    Position 0 is the user's current input. Items inserted with insert are
+    kept in memory for this session only and come before persisted entries.
+
+    Successful commands are also recorded once per distinct (mode, command)
+    in a commands table, with a trigram index used by search. Databases from
+    before the index existed are indexed on connect.
+
+    :param path: database path, defaults to default_path()
+    :param context: only entries recorded in this context are navigated
+    :param max_entries: number of entries, and of the context's most recently
+        used commands, kept when compacting
+    :param page_size: number of entries fetched per query while navigating
+    """
+
+    search_window = 2000
+
+    def __init__(self, path=None, context="", max_entries=10000, page_size=50):
+        self.path = path or default_path()
+        self.context = context
+        self.max_entries = max_entries
+        self.page_size = page_size
         self.index = 0
+        self._pending = []
+        self._pages = {}
+        self._anchor = None
+        self._adds = 0
+        self._db = None
+        self._lock = threading.Lock()
+        self._write_future = None
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="HotlineHistory"
+        )
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def wait(self):
+        """Block until pending writes finish"""
+
+        future = self._write_future
+        if future is not None:
+            future.result()
+
+    def _connect(self):
+        db = connect(self.path)
+        db.executescript(SCHEMA)
+        with db:
+            self._backfill(db)
+        return db
+
+    def _backfill(self, db):
+        if db.execute("SELECT 1 FROM commands LIMIT 1").fetchone():
+            return
+        rows = db.execute(
+            "SELECT context, mode, command, timestamp FROM history "
+            "WHERE success = 1 ORDER BY id"
+        )
+        for row in rows.fetchall():
+            self._index(db, *row)
 
-    def add(self, item):
-        self._list.insert(1, item)
+    def _index(self, db, context, mode, command, timestamp):
+        cursor = db.execute(
+            "UPDATE commands SET count = count + 1, last_used = ? "
+            "WHERE context = ? AND mode = ? AND command = ?",
+            (timestamp, context, mode, command),
+        )
+        if cursor.rowcount:
+            return
+
+        key = command.lower()
+        cursor = db.execute(
+            "INSERT INTO commands (context, mode, command, key, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (context, mode, command, key, timestamp),
+        )
+        command_id = cursor.lastrowid
+        db.executemany(
+            "INSERT OR IGNORE INTO grams (gram, command_id) VALUES (?, ?)",
+            [(gram, command_id) for gram in trigrams(key)],
+        )
+
+    def add(self, item, duration=None, success=True):
+        """Record an executed ModeCommand and return to position 0
+
+        :param item: ModeCommand
+        :param duration: Number of seconds the command took
+        :param success: False if the command failed
+        :returns: Future of the background write
+        """
+
+        mode = mode_name(item.mode)
+        timestamp = time.time()
+        future = self._writer.submit(
+            self._write, mode, item.command, timestamp, duration, success
+        )
+        self._write_future = future
+        self._pending = []
+        self._reset()
+        return future
+
+    def _write(self, mode, command, timestamp, duration, success):
+        try:
+            with self._lock, self.db as db:
+                db.execute(
+                    "INSERT INTO history "
+                    "(context, mode, command, timestamp, duration, success) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.context,
+                        mode,
+                        command,
+                        timestamp,
+                        duration,
+                        int(bool(success)),
+                    ),
+                )
+                if success:
+                    self._index(db, self.context, mode, command, timestamp)
+                self._adds += 1
+                if self._adds % 100 == 0:
+                    self._compact(db)
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    def _compact(self, db):
+        db.execute(
+            "DELETE FROM history WHERE id <= ("
+            "SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        stale = db.execute(
+            "SELECT id, key FROM commands WHERE context = ? AND last_used < ("
+            "SELECT last_used FROM commands WHERE context = ? "
+            "ORDER BY last_used DESC LIMIT 1 OFFSET ?)",
+            (self.context, self.context, self.max_entries - 1),
+        ).fetchall()
+        if not stale:
+            return
+        # Deleting by the grams of each key uses the primary key
+        db.executemany(
+            "DELETE FROM grams WHERE gram = ? AND command_id = ?",
+            [(gram, id) for id, key in stale for gram in trigrams(key)],
+        )
+        db.executemany("DELETE FROM commands WHERE id = ?", [(id,) for id, _ in stale])
+
+    def compact(self):
+        """Delete all but the newest max_entries entries and the context's
+        max_entries most recently used commands"""
+
+        self.wait()
+        with self._lock, self.db as db:
+            self._compact(db)
+        self._reset()
+
+    def _reset(self):
         self.index = 0
+        self._pages = {}
+        self._anchor = None
 
     def insert(self, index, item):
-        self._list.insert(index, item)
+        """Insert an unexecuted item at index for this session only"""
+
+        index = max(1, min(index, len(self._pending) + 1))
+        self._pending.insert(index - 1, item)
+        self._pages = {}
         self.index = index
 
+    def get(self, index):
+        """Return the ModeCommand at index or None"""
+
+        if index <= 0:
+            return
+        if index <= len(self._pending):
+            return self._pending[index - 1]
+
+        offset = index - len(self._pending) - 1
+        page, i = divmod(offset, self.page_size)
+        entries = self._page(page)
+        if i < len(entries):
+            return entries[i]
+
+    def _page(self, page):
+        if page not in self._pages:
+            self.wait()
+            with self._lock:
+                db = self.db
+                if self._anchor is None:
+                    row = db.execute("SELECT MAX(id) FROM history").fetchone()
+                    self._anchor = row[0] or 0
+                rows = db.execute(
+                    "SELECT mode, command FROM history "
+                    "WHERE context = ? AND success = 1 AND id <= ? "
+                    "ORDER BY id DESC LIMIT ? OFFSET ?",
+                    (self.context, self._anchor, self.page_size, page * self.page_size),
+                ).fetchall()
+            self._pages[page] = [ModeCommand(*row) for row in rows]
+        return self._pages[page]
+
+    def entries(self, limit=None, offset=0):
+        """Return recorded HistoryEntry objects, newest first"""
+
+        self.wait()
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT mode, command, timestamp, duration, success FROM history "
+                "WHERE context = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (self.context, -1 if limit is None else limit, offset),
+            ).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    def search(self, query, limit=50):
+        """Return ModeCommands containing query, most recently used first
+
+        The newest search_window commands are scanned first, which answers
+        common queries without touching the index. Otherwise queries of three
+        or more characters are answered from the trigram index and shorter
+        ones by scanning every command.
+
+        :param query: substring to search for, matched case-insensitively
+        :param limit: maximum number of results
+        """
+
+        query = query.lower()
+        self.wait()
+        with self._lock:
+            db = self.db
+            rows = db.execute(
+                "SELECT mode, command FROM ("
+                "SELECT mode, command, key, last_used FROM commands "
+                "WHERE context = ? ORDER BY last_used DESC LIMIT ?) "
+                "WHERE instr(key, ?) > 0 ORDER BY last_used DESC LIMIT ?",
+                (self.context, self.search_window, query, limit),
+            ).fetchall()
+            if len(rows) < limit:
+                rows = db.execute(*self._search_query(query, limit)).fetchall()
+        return [ModeCommand(*row) for row in rows]
+
+    def _search_query(self, query, limit):
+        grams = sorted(trigrams(query))
+        if not grams:
+            return (
+                "SELECT mode, command FROM commands WHERE context = ? "
+                "AND instr(key, ?) > 0 ORDER BY last_used DESC LIMIT ?",
+                (self.context, query, limit),
+            )
+
+        # CROSS JOIN makes SQLite drive the query from the posting lists
+        sql = (
+            "SELECT mode, command FROM ("
+            "SELECT command_id FROM grams WHERE gram IN ({}) "
+            "GROUP BY command_id HAVING COUNT(*) = ?) AS matches "
+            "CROSS JOIN commands ON commands.id = matches.command_id "
+            "WHERE context = ? AND instr(key, ?) > 0 "
+            "ORDER BY last_used DESC LIMIT ?"
+        ).format(", ".join("?" * len(grams)))
+        return sql, grams + [len(grams), self.context, query, limit]
+
     def next(self):
         self.index = max(self.index - 1, 0)
-        return self._list[self.index]
+        return self.get(self.index)
 
     def prev(self):
-        self.index = min(self.index + 1, len(self._list) - 1)
-        return self._list[self.index]
+        item = self.get(self.index + 1)
+        if item is not None:
+            self.index += 1
+            return item
+        return self.get(self.index)
+
+    def close(self):
+        self.wait()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,194 @@
+"""Commands executed off the GUI thread.
+
+Modes and Commands opt in with a threaded attribute. Context.execute then
+submits them to the app's JobPool and finishes them in the main thread once
+they resolve. Python threads can not be interrupted, so cancellation is
+cooperative. Jobs check current_job().cancel_requested, call
+current_job().check(), or register a callback with on_cancel, for example
+to kill a subprocess.
+
+.. usage::
+
+    def command():
+        job = current_job()
+        for i, item in enumerate(items):
+            job.check()
+            job.report(i, len(items))
+            process(item)
+"""
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+from hotline.utils import Executor
+
+__all__ = [
+    "Job",
+    "JobPool",
+    "current_job",
+]
+
+_local = threading.local()
+
+
+def current_job():
+    """Job executing in the calling thread or None"""
+
+    return getattr(_local, "job", None)
+
+
+class Job(Future):
+    """Future of a function run by a JobPool.
+
+    :param pool: JobPool running the job
+    :param name: label shown to the user
+    :param fn: callable to run
+    """
+
+    def __init__(self, pool, name, fn, *args, **kwargs):
+        super(Job, self).__init__()
+        self.pool = pool
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.progress = None
+        self._cancel_requested = threading.Event()
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    def cancel(self):
+        """Cancel a queued job, or ask a running job to stop.
+
+        :returns: False if the job already finished
+        """
+
+        if super(Job, self).cancel():
+            return True
+        if self.done():
+            return False
+
+        with self._lock:
+            self._cancel_requested.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            callback()
+        return True
+
+    def on_cancel(self, callback):
+        """Call callback when cancel is requested, immediately if it was"""
+
+        with self._lock:
+            if not self.cancel_requested:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        """Raise CancelledError if cancel was requested"""
+
+        if self.cancel_requested:
+            raise CancelledError()
+
+    def report(self, value, maximum=100, text=None):
+        """Report progress from the running job
+
+        :param value: amount of work done
+        :param maximum: amount of work in total
+        :param text: optional description of the current step
+        """
+
+        self.progress = (value, maximum, text)
+        self.pool.changed()
+
+    @property
+    def percent(self):
+        if not self.progress or not self.progress[1]:
+            return
+        value, maximum, _ = self.progress
+        return int(100 * min(max(value / float(maximum), 0), 1))
+
+    def run(self):
+        if not self.set_running_or_notify_cancel():
+            return
+
+        _local.job = self
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.set_exception(e)
+        else:
+            self.set_result(result)
+        finally:
+            _local.job = None
+
+
+class JobPool(object):
+    """Runs Jobs on a thread pool with a limit on concurrent jobs.
+
+    Jobs beyond max_workers wait in a queue. on_change is called in the main
+    thread, coalesced, whenever jobs start, finish or report progress.
+
+    :param max_workers: number of jobs that may run at once
+    :param on_change: optional callable receiving the JobPool
+    """
+
+    def __init__(self, max_workers=4, on_change=None):
+        self.max_workers = max_workers
+        self.on_change = on_change
+        self.jobs = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="HotlineJob"
+        )
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and return its Job"""
+
+        job = Job(self, name, fn, *args, **kwargs)
+        with self._lock:
+            self.jobs.append(job)
+        job.add_done_callback(self._discard)
+        self._executor.submit(job.run)
+        self.changed()
+        return job
+
+    def _discard(self, job):
+        with self._lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+        self.changed()
+
+    def changed(self):
+        if self.on_change:
+            Executor.coalesce((id(self), "changed"), self.on_change, self)
+
+    def cancel(self, job=None):
+        """Cancel job, by default the most recently submitted one
+
+        :returns: the cancelled Job or None
+        """
+
+        with self._lock:
+            jobs = [j for j in self.jobs if not j.cancel_requested]
+        if job is None:
+            if not jobs:
+                return
+            job = jobs[-1]
+        if job.cancel():
+            return job
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            job.cancel()
@@ -0,0 +1,213 @@
+"""In memory latency histograms of hotline's phases.
+
+Phases are timed with time.perf_counter_ns:
+
+- filter: matching the query against the CommandList
+- preview: computing and showing a Mode's preview of the query
+- dispatch: from Context.execute until the Mode starts running the command
+- execute: running the command, until a Task or Job resolves
+- show: the Dialog's show animation
+
+Each observation updates the phase's overall histogram, the histogram of
+its mode and the histogram of its command. Export with to_json or
+to_prometheus.
+"""
+import bisect
+import json
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+__all__ = [
+    "Histogram",
+    "Metrics",
+    "Observation",
+    "perf_counter_ns",
+    "registry",
+]
+
+MS = 1000000
+# Upper bounds of the histogram buckets in nanoseconds, the last bucket
+# holds everything slower
+BUCKETS = tuple(
+    int(ms * MS)
+    for ms in (
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+        25,
+        50,
+        100,
+        250,
+        500,
+        1000,
+        2500,
+        5000,
+        10000,
+        30000,
+        60000,
+    )
+)
+OTHER = "<other>"
+
+Observation = namedtuple("Observation", "phase mode command ns")
+
+
+class Histogram(object):
+    """Counts of durations in fixed buckets, plus count, sum, min and max"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, ns):
+        self.counts[bisect.bisect_left(BUCKETS, ns)] += 1
+        self.count += 1
+        self.sum += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if self.max is None or ns > self.max:
+            self.max = ns
+
+    def quantile(self, q):
+        """Estimate the q quantile in nanoseconds from the buckets"""
+
+        if not self.count:
+            return
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            if seen + count >= rank:
+                lower = BUCKETS[i - 1] if i else 0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        def ms(ns):
+            return None if ns is None else ns / float(MS)
+
+        return {
+            "count": self.count,
+            "sum_ms": ms(self.sum),
+            "min_ms": ms(self.min),
+            "max_ms": ms(self.max),
+            "p50_ms": ms(self.quantile(0.5)),
+            "p90_ms": ms(self.quantile(0.9)),
+            "p99_ms": ms(self.quantile(0.99)),
+        }
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics(object):
+    """Histograms keyed by (phase, mode, command), safe to use from any
+    thread.
+
+    Aggregates use "" for mode and command. Once max_commands distinct
+    commands are tracked, new commands are counted under "<other>" so ad hoc
+    Python commands can not grow memory without bound.
+
+    :param max_commands: maximum number of per command histograms
+    """
+
+    def __init__(self, max_commands=1000):
+        self.max_commands = max_commands
+        self.histograms = {}
+        self.last = {}
+        self._commands = set()
+        self._lock = threading.Lock()
+
+    def observe(self, phase, ns, mode="", command=""):
+        """Record a duration of ns nanoseconds"""
+
+        mode = getattr(mode, "name", mode) or ""
+        command = command or ""
+        with self._lock:
+            if command and (mode, command) not in self._commands:
+                if len(self._commands) < self.max_commands:
+                    self._commands.add((mode, command))
+                else:
+                    command = OTHER
+            keys = [(phase, "", "")]
+            if mode:
+                keys.append((phase, mode, ""))
+                if command:
+                    keys.append((phase, mode, command))
+            for key in keys:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.observe(ns)
+            self.last[phase] = Observation(phase, mode, command, ns)
+
+    @contextmanager
+    def timer(self, phase, mode="", command=""):
+        """Observe the duration of the with block"""
+
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe(phase, perf_counter_ns() - start, mode, command)
+
+    def get(self, phase, mode="", command=""):
+        """Return the Histogram for a key or None"""
+
+        return self.histograms.get((phase, getattr(mode, "name", mode), command))
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.last.clear()
+            self._commands.clear()
+
+    def _items(self):
+        with self._lock:
+            return sorted(self.histograms.items())
+
+    def to_json(self, indent=None):
+        data = []
+        for (phase, mode, command), histogram in self._items():
+            entry = {"phase": phase, "mode": mode, "command": command}
+            entry.update(histogram.to_dict())
+            data.append(entry)
+        return json.dumps(data, indent=indent)
+
+    def to_prometheus(self, name="hotline_phase_seconds"):
+        lines = [
+            "# HELP {} Latency of hotline phases.".format(name),
+            "# TYPE {} histogram".format(name),
+        ]
+        for (phase, mode, command), histogram in self._items():
+            labels = 'phase="{}",mode="{}",command="{}"'.format(
+                _label(phase), _label(mode), _label(command)
+            )
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (None,), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound is None else repr(bound / 1e9)
+                lines.append(
+                    '{}_bucket{{{},le="{}"}} {}'.format(name, labels, le, cumulative)
+                )
+            lines.append("{}_sum{{{}}} {!r}".format(name, labels, histogram.sum / 1e9))
+            lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the widgets, contexts and app
+registry = Metrics()
@@ -1,14 +1,57 @@
 from abc import abstractmethod
 from abc import abstractmethod, abstractproperty
-
-from hotline.command import Command
+from collections.abc import Iterator
+from concurrent.futures import Future
+
+from hotline.command import Command, CommandProvider
+from hotline.task import Task
+
+
+class CommandTask(Task):
+    """Task running a generator or async def command of a Mode.
+
+    Besides Futures, generators may yield a list of options or None to
+    prompt the user, resuming with the input or None when rejected. Options
+    may also be yielded as an iterator or generator, which streams into the
+    prompt while the user types. Yielding a Command ends the generator and
+    runs that Command instead.
+
+    A yielded Future is waited on. To prompt with a Future of options yield
+    app.prompt(options=future).
+    """
+
+    def __init__(self, mode, coro):
+        super(CommandTask, self).__init__(coro)
+        self.mode = mode
+
+    def handle(self, step):
+        if isinstance(step, Command):
+            self.finish(self.mode.run_command(step))
+            return
+        if isinstance(step, (list, tuple, Iterator)) or step is None:
+            return self.mode.app.prompt(options=step)
+        if isinstance(step, Future):
+            return step
+        raise TypeError(
+            "Generator yielded invalid type..."
+            "must be Sequence, Iterator, None, Command or Future not {}".format(
+                type(step)
+            )
+        )
 
 
 class Mode(object):
     prompt = None
+    # Seconds to cache commands, None caches them until invalidated and 0
+    # rebuilds them on every access
+    commands_ttl = None
+    # Run commands on the app's JobPool instead of the GUI thread, see
+    # hotline.jobs. Commands may override this with their threaded argument
+    threaded = False
 
     def __init__(self, app):
         self.app = app
+        self.provider = CommandProvider(lambda: self.commands, self.commands_ttl)
 
     def __str__(self):
         return self.label
@@ -24,32 +67,29 @@ class Mode(object):
         if not cmd:
             return self.execute(command)
 
-        if cmd.generator:
-            cmd_steps = cmd.command()
-            selection = None
-            result = None
-            try:
-                while result is None:
-                    if selection:
-                        step = cmd_steps.send(selection)
-                        selection = None
-                    else:
-                        step = cmd_steps.next()
-
-                    if isinstance(step, Command):
-                        result = step
-                    elif isinstance(step, (list, tuple)) or step is None:
-                        selection = self.app.get_user_input(options=step)
-                    else:
-                        raise Exception(
-                            "Generator yielded invalid type..."
-                            "must be Sequence, None or Command not {}".format(
-                                type(step)
-                            )
-                        )
-            finally:
-                cmd_steps.close()
-                cmd = result
+        return self.run_command(cmd)
+
+    def is_threaded(self, command):
+        """Return True if command should run off the GUI thread.
+
+        Generator and async commands always run in the GUI thread, they
+        suspend instead of blocking while they wait.
+        """
+
+        cmd = self.get_command(command)
+        if cmd is None:
+            return self.threaded
+        if cmd.generator or cmd.coroutine:
+            return False
+        if cmd.threaded is None:
+            return self.threaded
+        return cmd.threaded
+
+    def run_command(self, cmd):
+        """Run a Command object, returns its result or a Task"""
+
+        if cmd.generator or cmd.coroutine:
+            return CommandTask(self, cmd.command()).start()
 
         if cmd.callable:
             return cmd()
@@ -71,12 +111,36 @@ class Mode(object):
         """[optional] return path to an icon"""
         return
 
-    def get_command(self, name):
-        for command in self.commands:
-            if command.name == name:
-                return command
+    def close(self):
+        """[optional] release resources like callbacks, called when the mode
+        is removed from hotline"""
         return
 
+    def activate(self):
+        """[optional] called when the mode becomes active and each time
+        hotline is shown, for example to snapshot the selection"""
+        return
+
+    def preview(self, text):
+        """[optional] return rows previewing what executing text would do
+
+        While rows are returned they replace the commands in the list. Only
+        the visible rows are read, so rows may be any object supporting len
+        and indexing, see renamer.RenamePreview.
+        """
+        return
+
+    def get_command(self, name):
+        return self.provider.get(name)
+
+    def get_commands(self):
+        """Return the cached list of Command objects"""
+        return self.provider.commands
+
+    def invalidate_commands(self):
+        """Rebuild commands the next time they are requested"""
+        self.provider.invalidate()
+
     @abstractproperty
     def commands(self):
         """return a list of Command objects"""
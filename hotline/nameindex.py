@@ -0,0 +1,297 @@
+"""Index of object names for fast regex and substring queries.
+
+Names are indexed by their trigrams. A query first intersects the postings
+of the trigrams of the literal text every match must contain, then only
+tests the remaining candidates with the regex.
+
+.. usage::
+
+    index = NameIndex()
+    index.add(1, "L_arm_JNT")
+    index.add(2, "R_arm_JNT")
+    index.match(r"L_.*_JNT")  # [1]
+    index.search("arm")  # [1, 2]
+"""
+import re
+from array import array
+
+from hotline.history import trigrams
+
+__all__ = [
+    "NameIndex",
+    "literals",
+]
+
+SPECIAL = set(".^$*+?{}[]|()\\")
+# Digits following escapes like \x41, never literal text
+HEX_DIGITS = {"x": 2, "u": 4, "U": 8}
+# Quantifiers that make the preceding character optional
+OPTIONAL = set("*?{")
+EMPTY = frozenset()
+
+
+class _Keys(set):
+    """Keys sharing a name, a name with one key maps to the key itself"""
+
+
+def _skip_class(pattern, i):
+    """Return the index after the character class starting at i"""
+
+    i += 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_escape(pattern, i):
+    """Return the index after the escape starting at i"""
+
+    escaped = pattern[i + 1 : i + 2]
+    i += 2
+    if escaped in HEX_DIGITS:
+        return i + HEX_DIGITS[escaped]
+    if escaped == "N":
+        end = pattern.find("}", i)
+        return len(pattern) if end < 0 else end + 1
+    if escaped.isdigit():
+        # Octal escapes and group references take up to 3 digits
+        end = i
+        while end < len(pattern) and end < i + 2 and pattern[end].isdigit():
+            end += 1
+        return end
+    return i
+
+
+def literals(pattern):
+    """Return the literal text every match of pattern contains.
+
+    Only text outside of groups and classes is considered and patterns with
+    alternation or inline flags give up, so the result is conservative.
+
+    :param pattern: regular expression
+    :returns: (prefix, runs) where prefix is the text every match starts
+        with and runs are texts every match contains
+    """
+
+    if "|" in pattern or "(?" in pattern:
+        return "", []
+
+    runs = []
+    run = []
+    prefix = None
+    depth = 0
+    i = 1 if pattern.startswith("^") else 0
+
+    while i < len(pattern):
+        c = pattern[i]
+        literal = None
+        if c == "\\":
+            escaped = pattern[i + 1 : i + 2]
+            if escaped and not escaped.isalnum() and not depth:
+                literal = escaped
+            i = _skip_escape(pattern, i)
+        elif c == "[":
+            i = _skip_class(pattern, i)
+        elif c == "{":
+            end = pattern.find("}", i)
+            i = len(pattern) if end < 0 else end + 1
+        else:
+            if c not in SPECIAL and not depth:
+                literal = c
+            elif c == "(":
+                depth += 1
+            elif c == ")":
+                depth -= 1
+            i += 1
+
+        following = pattern[i : i + 1]
+        if literal is not None and following not in OPTIONAL:
+            run.append(literal)
+            if following != "+":
+                continue
+
+        # Anything but a required literal ends the run
+        if prefix is None:
+            prefix = "".join(run)
+        if run:
+            runs.append("".join(run))
+            run = []
+
+    if prefix is None:
+        prefix = "".join(run)
+    if run:
+        runs.append("".join(run))
+    return prefix, runs
+
+
+class NameIndex(object):
+    """Names of objects, indexed for regex and substring queries.
+
+    Objects are identified by hashable keys. Several keys may share a name,
+    like Maya DAG nodes under different parents.
+
+    Each distinct name gets an id and each trigram an array of the ids of
+    the names containing it, 4 bytes per entry. Removed ids stay in the
+    arrays until they outnumber the live ones, then the arrays are rebuilt.
+    """
+
+    # Postings up to this many times larger than the rarest one are
+    # intersected, the regex checks the rest
+    max_ratio = 4
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, key):
+        return key in self._names
+
+    def name(self, key):
+        return self._names.get(key)
+
+    def keys(self, name):
+        """Keys of the objects named name"""
+
+        if name not in self._keys:
+            return set()
+        keys = self._keys[name]
+        if type(keys) is _Keys:
+            return set(keys)
+        return {keys}
+
+    def add(self, key, name):
+        if key in self._names:
+            if self._names[key] == name:
+                return
+            self.remove(key)
+        self._names[key] = name
+        if name not in self._keys:
+            self._keys[name] = key
+            self._index(name)
+            return
+        keys = self._keys[name]
+        if type(keys) is not _Keys:
+            keys = self._keys[name] = _Keys([keys])
+        keys.add(key)
+
+    def _index(self, name):
+        id = len(self._by_id)
+        self._by_id.append(name)
+        self._ids[name] = id
+        grams = self._grams
+        # A repeated trigram repeats the id, cheaper than deduplicating
+        for i in range(len(name) - 2):
+            gram = name[i : i + 3]
+            try:
+                grams[gram].append(id)
+            except KeyError:
+                grams[gram] = array("I", [id])
+
+    def remove(self, key):
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        keys = self._keys[name]
+        if type(keys) is _Keys:
+            keys.discard(key)
+            if len(keys) > 1:
+                return
+            self._keys[name] = keys.pop()
+            return
+        del self._keys[name]
+        self._by_id[self._ids.pop(name)] = None
+        self._removed += 1
+        if self._removed > len(self._ids):
+            self._compact()
+
+    def rename(self, key, name):
+        self.add(key, name)
+
+    def clear(self):
+        self._names = {}
+        self._keys = {}
+        self._ids = {}
+        self._by_id = []
+        self._grams = {}
+        self._removed = 0
+
+    def _compact(self):
+        names = list(self._ids)
+        self._ids = {}
+        self._by_id = []
+        self._grams = {}
+        self._removed = 0
+        for name in names:
+            self._index(name)
+
+    def candidates(self, texts):
+        """Names that may contain every text, or None if texts are too short
+        to narrow them down"""
+
+        grams = set()
+        for text in texts:
+            grams.update(trigrams(text))
+        if not grams:
+            return
+
+        postings = sorted((self._grams.get(gram, EMPTY) for gram in grams), key=len)
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            if not ids or len(posting) > len(postings[0]) * self.max_ratio:
+                break
+            ids.intersection_update(posting)
+        by_id = self._by_id
+        return [by_id[id] for id in ids if by_id[id] is not None]
+
+    def _query(self, names, test, among):
+        """Keys whose name passes test, a C method like re.Pattern.match
+        for speed, checking only the candidate names when given"""
+
+        if among is not None:
+            if names is not None:
+                names = set(names)
+            keys = []
+            for key in among:
+                name = self._names.get(key)
+                if name is None or (names is not None and name not in names):
+                    continue
+                if test(name):
+                    keys.append(key)
+            return keys
+
+        if names is None:
+            return [key for key, name in self._names.items() if test(name)]
+
+        keys = []
+        for name in names:
+            if test(name):
+                found = self._keys[name]
+                if type(found) is _Keys:
+                    keys.extend(found)
+                else:
+                    keys.append(found)
+        return keys
+
+    def match(self, pattern, flags=0, among=None):
+        """Keys of objects whose name matches pattern with re.match
+
+        :param pattern: regular expression
+        :param flags: re flags
+        :param among: optional keys to restrict the query to
+        """
+
+        regex = re.compile(pattern, flags)
+        runs = [] if flags & re.IGNORECASE else literals(pattern)[1]
+        return self._query(self.candidates(runs), regex.match, among)
+
+    def search(self, text, among=None):
+        """Keys of objects whose name contains text"""
+
+        test = re.compile(re.escape(text)).search
+        return self._query(self.candidates([text]), test, among)
@@ -1,4 +1,11 @@
+import collections
+import functools
+import itertools
 import re
+import uuid
+
+
+INVALID_FULL_RENAME = re.compile(r"[!@$%^&*()\[\]\\|;,<.?/+=]")
 
 
 class TokenError(Exception):
@@ -18,12 +25,14 @@ class FullRenameToken(object):
     def __call__(self, in_str):
         return self.rename_str
 
+    def source(self, expr):
+        return repr(self.rename_str)
+
     @staticmethod
     def match(part):
         if part.startswith("-"):
             return False
-        invalid_chars = "!@$%^&*()[]\\|;,<.?/+="
-        return all(c not in part for c in invalid_chars)
+        return not INVALID_FULL_RENAME.search(part)
 
 
 class SubstituteToken(Token):
@@ -36,6 +45,9 @@ class SubstituteToken(Token):
     def __call__(self, in_str):
         return in_str.replace(self.search_str, self.replace_str)
 
+    def source(self, expr):
+        return "{}.replace({!r}, {!r})".format(expr, self.search_str, self.replace_str)
+
     @staticmethod
     def match(part, next_part):
         if part.startswith("+") or next_part.startswith("+"):
@@ -56,6 +68,9 @@ class RemoveToken(Token):
     def __call__(self, in_str):
         return in_str.replace(self.remove_str, "")
 
+    def source(self, expr):
+        return "{}.replace({!r}, '')".format(expr, self.remove_str)
+
     @staticmethod
     def match(part):
         return part.startswith("-")
@@ -70,6 +85,9 @@ class AddSuffixToken(Token):
     def __call__(self, in_str):
         return in_str + self.add_str
 
+    def source(self, expr):
+        return "({} + {!r})".format(expr, self.add_str)
+
     @staticmethod
     def match(part):
         return part.startswith("+")
@@ -84,68 +102,289 @@ class AddPrefixToken(Token):
     def __call__(self, in_str):
         return self.add_str + in_str
 
+    def source(self, expr):
+        return "({!r} + {})".format(self.add_str, expr)
+
     @staticmethod
     def match(part):
         return part.endswith("+")
 
 
+PADDING_PATTERN = re.compile(r"(#+)(?:\((\d+)\))?")
+
+
 def preprocess_string(rename_str):
     """Preprocesses rename_str and extracts arguments for formatting."""
 
     format_args = []
-    matches = re.findall(r"(#+)(\((\d+)\))?", rename_str)
-    for i, match in enumerate(matches):
-        padding = len(match[0])
-        start = 1
-        if match[2]:
-            start = int(match[2])
-        rename_str = re.sub(
-            re.escape(match[0] + match[1]), "{%d:0>%d}" % (i, padding), rename_str, 1
-        )
-        format_args.append(start)
+
+    def replace(match):
+        padding, start = match.groups()
+        format_args.append(int(start) if start else 1)
+        return "{%d:0>%d}" % (len(format_args) - 1, len(padding))
+
+    rename_str = PADDING_PATTERN.sub(replace, rename_str)
     return rename_str, format_args
 
 
+# Tried in order at each part of a rename string
+TOKENS = (SubstituteToken, RemoveToken, AddSuffixToken, AddPrefixToken)
+
+
+def tokenize(rename_str):
+    """Split a preprocessed rename_str into a list of Tokens in one pass.
+
+    At each part the first of TOKENS to match consumes its parts.
+    """
+
+    parts = rename_str.split()
+
+    if len(parts) == 1 and FullRenameToken.match(parts[0]):
+        return [FullRenameToken(parts[0])]
+
+    tokens = []
+    i = 0
+    while i < len(parts):
+        for token in TOKENS:
+            end = i + token.consumes
+            if end <= len(parts) and token.match(*parts[i:end]):
+                tokens.append(token(*parts[i:end]))
+                i = end
+                break
+        else:
+            raise TokenError(parts[i] + " is not a valid string")
+    return tokens
+
+
+def compile_tokens(tokens, start_values=None):
+    """Compile tokens into a single function of (name, index).
+
+    The tokens are inlined into one expression, so renaming a name costs a
+    single call instead of one call per token. When start_values are given
+    the result is formatted with index + start for each value.
+    """
+
+    expr = "name"
+    for token in tokens:
+        expr = token.source(expr)
+    if start_values:
+        args = ", ".join("index + {!r}".format(v) for v in start_values)
+        expr = "{}.format({})".format(expr, args)
+    return eval("lambda name, index: " + expr, {})
+
+
+Parsed = collections.namedtuple(
+    "Parsed", "rename_str start_values tokens rename rename_indexed"
+)
+
+
+@functools.lru_cache(maxsize=256)
+def parse(rename_str):
+    """Preprocess, tokenize and compile rename_str.
+
+    Results are cached, parsing the same rename string again is a lookup.
+
+    :returns: Parsed
+    """
+
+    rename_str, start_values = preprocess_string(rename_str)
+    tokens = tuple(tokenize(rename_str))
+    return Parsed(
+        rename_str,
+        tuple(start_values),
+        tokens,
+        compile_tokens(tokens),
+        compile_tokens(tokens, start_values),
+    )
+
+
 class Renamer(object):
+    """Renames strings using a rename string like "pre_+ -old +_##".
+
+    The rename string is tokenized and compiled once, use rename_many or
+    rename_all to rename many names with the same Renamer.
+    """
+
     def __init__(self, rename_str):
         self.original_str = rename_str
-        self.rename_str, self.start_values = preprocess_string(rename_str)
-        self.tokens = []
-        self.tokenize()
+        parsed = parse(rename_str)
+        self.rename_str = parsed.rename_str
+        self.start_values = list(parsed.start_values)
+        self.tokens = list(parsed.tokens)
+        self._rename = parsed.rename
+        self._rename_indexed = parsed.rename_indexed
 
     def tokenize(self):
-        parts = self.rename_str.split()
+        self.tokens = tokenize(self.rename_str)
+        self.compile()
 
-        if len(parts) == 1 and FullRenameToken.match(parts[0]):
-            self.tokens.append(FullRenameToken(parts[0]))
-            return
+    def compile(self):
+        """Compile the tokens, called by tokenize"""
 
-        while parts:
-            num_parts = len(parts)
+        self._rename = compile_tokens(self.tokens)
+        self._rename_indexed = compile_tokens(self.tokens, self.start_values)
 
-            for token in Token.__subclasses__():
-                if len(parts) < token.consumes:
-                    continue
+    def rename(self, input_str, index=None):
+        if not self.tokens:
+            self.tokenize()
 
-                match_parts = parts[: token.consumes]
-                if token.match(*match_parts):
-                    self.tokens.append(token(*match_parts))
-                    for _ in range(token.consumes):
-                        parts.pop(0)
+        if index is None:
+            return self._rename(input_str, None)
+        return self._rename_indexed(input_str, index)
 
-            if num_parts == len(parts):
-                self.tokens = []
-                raise TokenError(parts[0] + " is not a valid string")
+    def rename_many(self, names, start=0):
+        """Yield the new name of each name, numbered from index start
+
+        :param names: iterable of names
+        :param start: index of the first name
+        """
 
-    def rename(self, input_str, index=None):
         if not self.tokens:
             self.tokenize()
 
-        for token in self.tokens:
-            input_str = token(input_str)
+        yield from map(self._rename_indexed, names, itertools.count(start))
 
-        if self.start_values and index is not None:
-            indices = [v + index for v in self.start_values]
-            input_str = input_str.format(*indices)
+    def rename_all(self, names, start=0):
+        """Return a list of the new names, numbered from index start"""
 
-        return input_str
+        if not self.tokens:
+            self.tokenize()
+
+        return list(map(self._rename_indexed, names, itertools.count(start)))
+
+
+def _free_name(name, scope, taken, held, exists):
+    """Return name with the lowest free numeric suffix, like Maya does"""
+
+    base = name.rstrip("0123456789")
+    number = int(name[len(base) :] or 0)
+    while True:
+        number += 1
+        candidate = base + str(number)
+        key = (scope, candidate)
+        if key in taken:
+            continue
+        # Held names are freed when their nodes are renamed
+        if key in held or not (exists and exists(candidate, scope)):
+            return candidate
+
+
+def plan_renames(names, new_names, exists=None, scopes=None):
+    """Plan renaming names to new_names without collisions.
+
+    Names must be unique within a scope, like the children of one Maya
+    parent. A new name taken in its scope, by an earlier new name, by a name
+    that is not renamed, or by exists, gets the lowest free numeric suffix.
+    Nodes renamed to a name that another renamed node still holds first move
+    to a temporary name, so names may be swapped.
+
+    :param names: current names
+    :param new_names: wanted names, in the same order
+    :param exists: optional callable(name, scope) returning True if a node
+        outside of names holds name in scope
+    :param scopes: optional scope of each name, None for a single scope
+    :returns: list of (index, name) renames to apply in order
+    """
+
+    scopes = scopes or [None] * len(names)
+    changing = [i for i, name in enumerate(names) if new_names[i] != name]
+    held = {(scopes[i], names[i]): i for i in changing}
+    taken = set(zip(scopes, names)).difference(held)
+
+    final = {}
+    for i in changing:
+        scope, name = scopes[i], new_names[i]
+        key = (scope, name)
+        if key in taken or (key not in held and exists and exists(name, scope)):
+            name = _free_name(name, scope, taken, held, exists)
+            key = (scope, name)
+        taken.add(key)
+        final[i] = name
+
+    temporary = "hotlineRename{}_".format(uuid.uuid4().hex[:8])
+    moves = []
+    direct = []
+    for i in changing:
+        name = final[i]
+        if name == names[i]:
+            continue
+        if (scopes[i], name) in held:
+            moves.append(i)
+        else:
+            direct.append((i, name))
+
+    plan = [(i, temporary + str(i)) for i in moves]
+    plan.extend(direct)
+    plan.extend((i, final[i]) for i in moves)
+    return plan
+
+
+class RenamePreview(object):
+    """Rows of "old -> new" previewing a rename of a snapshot of names.
+
+    Each update is O(n) in the number of names: finding duplicates needs
+    every new name, so all names are renamed with one call to the compiled
+    Renamer and counted. Only the row strings are lazy, they are built when
+    a row is read, so a view formats just the rows it shows. That keeps 10k
+    names at a few milliseconds per keystroke.
+
+    :param names: names to rename, like the short names of a selection
+    :param exists: optional callable returning True if a name is taken
+    """
+
+    def __init__(self, names, exists=None):
+        self.names = list(names)
+        self.exists = exists
+        self.new_names = self.names
+        self.error = None
+        self._old = set(self.names)
+        self._counts = {}
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        row = self._rows.get(index)
+        if row is None:
+            old, new = self.names[index], self.new_names[index]
+            if old == new:
+                row = old
+            else:
+                row = "{} -> {}".format(old, new)
+                collision = self.collision(index)
+                if collision:
+                    row += " ({})".format(collision)
+            self._rows[index] = row
+        return row
+
+    def update(self, rename_str):
+        """Preview rename_str, returns self"""
+
+        self._rows = {}
+        self.error = None
+        renamer = None
+        if rename_str.strip():
+            try:
+                renamer = Renamer(rename_str)
+            except TokenError as e:
+                self.error = str(e)
+
+        if renamer is None:
+            self.new_names = self.names
+            self._counts = {}
+        else:
+            self.new_names = renamer.rename_all(self.names)
+            self._counts = collections.Counter(self.new_names)
+        return self
+
+    def collision(self, index):
+        """Return "duplicate" or "exists" if the new name of a row is taken"""
+
+        new = self.new_names[index]
+        if new == self.names[index]:
+            return
+        if self._counts.get(new, 0) > 1:
+            return "duplicate"
+        if new not in self._old and self.exists and self.exists(new):
+            return "exists"
@@ -0,0 +1,129 @@
+"""Thread aware capture of sys.stdout and sys.stderr.
+
+install replaces sys.stdout and sys.stderr with StreamProxy objects. A proxy
+forwards writes to the original stream unless the writing thread is inside
+a capture block, in which case they go to that block's target. Other
+threads keep writing to the original streams while a command is captured.
+"""
+import itertools
+import sys
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+__all__ = [
+    "Invocation",
+    "LazyText",
+    "StreamProxy",
+    "capture",
+    "current_capture",
+    "current_invocation",
+    "install",
+]
+
+_local = threading.local()
+_counter = itertools.count(1)
+
+
+class Invocation(namedtuple("Invocation", "id mode command")):
+    """Tags output written while a command executes"""
+
+    def __new__(cls, mode, command):
+        return super(Invocation, cls).__new__(cls, next(_counter), mode, command)
+
+    def __str__(self):
+        return "[{}] {}".format(self.mode, self.command)
+
+
+class LazyText(object):
+    """Converts obj to text only when str is called, truncated to limit
+    characters. Lets workers hand large results to the console without
+    paying for formatting in their own thread.
+    """
+
+    def __init__(self, obj, limit=4000, end="\n"):
+        self.obj = obj
+        self.limit = limit
+        self.end = end
+
+    def __str__(self):
+        text = str(self.obj)
+        if len(text) > self.limit:
+            truncated = len(text) - self.limit
+            text = text[: self.limit] + "...[{} characters truncated]".format(truncated)
+        return text + self.end
+
+
+class StreamProxy(object):
+    """Stand-in for sys.stdout or sys.stderr that routes writes per thread"""
+
+    def __init__(self, name, original):
+        self.name = name
+        self.original = original
+
+    def write(self, message):
+        target = getattr(_local, self.name, None)
+        if target is None:
+            return self.original.write(message)
+        return target.write(message)
+
+    def flush(self):
+        target = getattr(_local, self.name, None)
+        if target is None:
+            return self.original.flush()
+
+    def __getattr__(self, attr):
+        return getattr(self.original, attr)
+
+
+def install():
+    """Replace sys.stdout and sys.stderr with StreamProxy objects once"""
+
+    for name in ("stdout", "stderr"):
+        stream = getattr(sys, name)
+        if not isinstance(stream, StreamProxy):
+            setattr(sys, name, StreamProxy(name, stream))
+
+
+def current_invocation():
+    """Invocation being captured in the calling thread or None"""
+
+    return getattr(_local, "invocation", None)
+
+
+def current_capture():
+    """Arguments of the calling thread's active capture or None.
+
+    Passing them back to capture later, for example when a suspended command
+    resumes, routes output to the same place.
+    """
+
+    stdout = getattr(_local, "stdout", None)
+    if stdout is None:
+        return
+    return stdout, _local.stderr, _local.invocation
+
+
+@contextmanager
+def capture(stdout, stderr=None, invocation=None):
+    """Redirect the calling thread's stdout and stderr.
+
+    :param stdout: file-like object receiving stdout writes
+    :param stderr: file-like object receiving stderr writes, defaults to stdout
+    :param invocation: optional Invocation tagging the captured output
+    :returns: context manager yielding invocation
+    """
+
+    install()
+    previous = (
+        getattr(_local, "stdout", None),
+        getattr(_local, "stderr", None),
+        getattr(_local, "invocation", None),
+    )
+    _local.stdout = stdout
+    _local.stderr = stderr or stdout
+    _local.invocation = invocation
+    try:
+        yield invocation
+    finally:
+        _local.stdout, _local.stderr, _local.invocation = previous
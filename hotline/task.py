@@ -0,0 +1,192 @@
+"""Resumable commands driven from the Qt event loop.
+
+A Task steps a generator or coroutine until it yields or awaits a Future,
+then returns to the event loop. When the Future resolves, the Task resumes in
+the main thread with its result. Any number of Tasks may be suspended at
+once without nesting event loops or holding stack frames.
+
+.. usage::
+
+    def command():
+        name = yield app.prompt("name")
+        print(name)
+
+    async def command():
+        name = await app.prompt("name")
+        print(name)
+
+    Task(command()).start()
+"""
+from concurrent import futures
+
+from hotline import stream
+from hotline.utils import Executor
+
+__all__ = [
+    "Future",
+    "Task",
+    "outcome",
+    "wait",
+]
+
+
+class Future(futures.Future):
+    """concurrent.futures.Future that may also be awaited inside a Task"""
+
+    def __await__(self):
+        result = yield self
+        return result
+
+
+class _Wait(object):
+    def __init__(self, future):
+        self.future = future
+
+    def __await__(self):
+        result = yield self.future
+        return result
+
+
+def wait(future):
+    """Make any concurrent.futures.Future awaitable inside a Task"""
+
+    return _Wait(future)
+
+
+def _error(future):
+    if future.cancelled():
+        return futures.CancelledError()
+    return future.exception()
+
+
+def outcome(future):
+    """Return the result of a done future, or its exception instead of
+    raising it.
+    """
+
+    error = _error(future)
+    if error is not None:
+        return error
+    return future.result()
+
+
+class Task(Future):
+    """Drives a generator or coroutine, resolving to its return value.
+
+    Each step runs in the main thread inside the stream capture that was
+    active when the Task was created, so output from a resumed command goes
+    to the same place as output from its first step.
+
+    Subclasses override handle to accept other yielded values.
+
+    :param coro: generator or coroutine object
+    """
+
+    def __init__(self, coro):
+        super(Task, self).__init__()
+        self.coro = coro
+        self.waiting = None
+        self._capture = stream.current_capture()
+
+    def start(self):
+        """Run the first step and return self"""
+
+        self._step()
+        return self
+
+    def cancel(self):
+        """Cancel the Task, closing its coroutine and what it waits on"""
+
+        if not super(Task, self).cancel():
+            return False
+        if self.waiting is not None:
+            self.waiting.cancel()
+        self.coro.close()
+        return True
+
+    def handle(self, step):
+        """Return a Future to wait on for a yielded value.
+
+        Returning None means the Task was resolved by the handler.
+        """
+
+        if isinstance(step, futures.Future):
+            return step
+        raise TypeError(
+            "Task yielded invalid type, must be Future not {}".format(type(step))
+        )
+
+    def finish(self, result):
+        """Close the coroutine and resolve to result.
+
+        When result is itself a Future the Task resolves with it.
+        """
+
+        self.coro.close()
+        if isinstance(result, futures.Future):
+            self.waiting = result
+            result.add_done_callback(self._follow)
+            return
+        self.set_result(result)
+
+    def _follow(self, future):
+        Executor.execute(self._resolve, future)
+
+    def _resolve(self, future):
+        if self.done():
+            return
+        self.waiting = None
+        error = _error(future)
+        if error is not None:
+            self.set_exception(error)
+        else:
+            self.set_result(future.result())
+
+    def _step(self, value=None, error=None):
+        if self.done():
+            return
+
+        if self._capture:
+            with stream.capture(*self._capture):
+                self._advance(value, error)
+        else:
+            self._advance(value, error)
+
+    def _advance(self, value, error):
+        try:
+            if error is not None:
+                step = self.coro.throw(error)
+            else:
+                step = self.coro.send(value)
+        except StopIteration as e:
+            self.set_result(e.value)
+            return
+        except BaseException as e:
+            self.set_exception(e)
+            return
+
+        try:
+            waiting = self.handle(step)
+        except Exception as e:
+            self.coro.close()
+            self.set_exception(e)
+            return
+
+        if waiting is not None:
+            self.waiting = waiting
+            waiting.add_done_callback(self._wake)
+
+    def _wake(self, future):
+        # Resume from the event loop, even if the future resolved in the
+        # main thread, so steps never nest.
+        Executor.execute(self._resume, future)
+
+    def _resume(self, future):
+        if self.done() or future is not self.waiting:
+            return
+        self.waiting = None
+        error = _error(future)
+        if error is not None:
+            self._step(error=error)
+        else:
+            self._step(future.result())
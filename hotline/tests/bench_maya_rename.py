@@ -0,0 +1,306 @@
+"""Compare renaming with maya_rename against cmds.rename per node.
+
+Runs outside of Maya against a small stand-in of maya.cmds and
+maya.api.OpenMaya. The stand-in resolves path strings and renames nodes in
+pure Python, so it measures the work hotline does per node, not the cost of
+Maya's command engine, which only widens the gap.
+
+.. usage::
+
+    python -m hotline.tests.bench_maya_rename [chains] [depth]
+"""
+import sys
+import time
+import types
+
+from hotline.renamer import Renamer
+
+
+class Node(object):
+    def __init__(self, scene, name, parent=None, dag=True):
+        self.scene = scene
+        self.name = name
+        self.parent = parent
+        self.dag = dag
+        self.parents = [parent] if parent is not None else []
+        self.children = []
+        self.by_name = {}
+        if parent is not None:
+            parent.children.append(self)
+            parent.by_name[name] = self
+        scene.names[name] = scene.names.get(name, 0) + 1
+        scene.nodes.append(self)
+
+    def instance(self, parent):
+        """Add parent as another parent of this node"""
+
+        self.parents.append(parent)
+        parent.children.append(self)
+        parent.by_name[self.name] = self
+
+    def hasFn(self, fn):
+        return fn == MFn.kDagNode and self.dag
+
+    def path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return "|" + "|".join(reversed(parts))
+
+
+class Scene(object):
+    def __init__(self):
+        self.names = {}
+        self.nodes = []
+        self.world = Node(self, "", dag=True)
+        self.selection = []
+
+    def set_name(self, node, name):
+        for parent in node.parents:
+            if name in parent.by_name:
+                raise RuntimeError("{} already exists under its parent".format(name))
+        for parent in node.parents:
+            del parent.by_name[node.name]
+            parent.by_name[name] = node
+        self.names[node.name] -= 1
+        node.name = name
+        self.names[name] = self.names.get(name, 0) + 1
+
+    def find(self, path):
+        node = self.world
+        for part in path.strip("|").split("|"):
+            node = node.by_name[part]
+        return node
+
+
+scene = None
+
+
+class MFn(object):
+    kDagNode = 1
+
+
+class MObjectHandle(object):
+    def __init__(self, obj):
+        self.obj = obj
+
+    def object(self):
+        return self.obj
+
+    def isValid(self):
+        return True
+
+    def hashCode(self):
+        return id(self.obj)
+
+
+class MFnDependencyNode(object):
+    def __init__(self, obj):
+        self.obj = obj
+
+    def name(self):
+        return self.obj.name
+
+
+class MFnDagNode(MFnDependencyNode):
+    def parentCount(self):
+        return len(self.obj.parents)
+
+    def parent(self, index):
+        return self.obj.parents[index]
+
+    def childCount(self):
+        return len(self.obj.children)
+
+    def child(self, index):
+        return self.obj.children[index]
+
+
+class MDagModifier(object):
+    def __init__(self):
+        self.renames = []
+        self.done = []
+
+    def renameNode(self, obj, name):
+        self.renames.append((obj, name))
+
+    def doIt(self):
+        for obj, name in self.renames:
+            self.done.append((obj, obj.name))
+            scene.set_name(obj, name)
+
+    def undoIt(self):
+        while self.done:
+            obj, name = self.done.pop()
+            scene.set_name(obj, name)
+
+
+class MPxCommand(object):
+    pass
+
+
+class MFnPlugin(object):
+    def __init__(self, plugin):
+        pass
+
+    def registerCommand(self, name, creator):
+        def command():
+            cmd = creator()
+            cmd.doIt(None)
+            commands.undo.append(cmd)
+
+        setattr(commands, name, command)
+
+    def deregisterCommand(self, name):
+        delattr(commands, name)
+
+
+class MSelectionList(object):
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def length(self):
+        return len(self.nodes)
+
+    def getDependNode(self, index):
+        return self.nodes[index]
+
+    def getSelectionStrings(self, index):
+        return [self.nodes[index].path()]
+
+
+class MGlobal(object):
+    @staticmethod
+    def getActiveSelectionList():
+        return MSelectionList(scene.selection)
+
+
+class Commands(types.ModuleType):
+    def __init__(self):
+        super(Commands, self).__init__("maya.cmds")
+        self.plugins = set()
+        self.undo = []
+
+    def rename(self, path, name):
+        node = scene.find(path)
+        scene.set_name(node, name)
+        return node.path()
+
+    def objExists(self, name):
+        return scene.names.get(name, 0) > 0
+
+    def ls(self, name, dagObjects=False):
+        return [
+            node.path() if node.dag else node.name
+            for node in scene.nodes
+            if node.name == name and (node.dag or not dagObjects)
+        ]
+
+    def pluginInfo(self, name, query=False, loaded=False):
+        return name in self.plugins
+
+    def loadPlugin(self, path, quiet=False):
+        from hotline.contexts import maya_rename
+
+        maya_rename.initializePlugin(None)
+        self.plugins.add(path.replace("\\", "/").rsplit("/", 1)[-1])
+
+
+commands = Commands()
+
+
+def install():
+    """Install the stand-in maya package in sys.modules"""
+
+    maya = types.ModuleType("maya")
+    api = types.ModuleType("maya.api")
+    openmaya = types.ModuleType("maya.api.OpenMaya")
+    for cls in (
+        MDagModifier,
+        MFn,
+        MFnDagNode,
+        MFnDependencyNode,
+        MFnPlugin,
+        MGlobal,
+        MObjectHandle,
+        MPxCommand,
+        MSelectionList,
+    ):
+        setattr(openmaya, cls.__name__, cls)
+    maya.cmds = commands
+    maya.api = api
+    api.OpenMaya = openmaya
+    sys.modules.update(
+        {
+            "maya": maya,
+            "maya.api": api,
+            "maya.api.OpenMaya": openmaya,
+            "maya.cmds": commands,
+        }
+    )
+
+
+def build(chains, depth):
+    """Select chains of joints, parents before their children"""
+
+    global scene
+
+    scene = Scene()
+    for c in range(chains):
+        parent = scene.world
+        for d in range(depth):
+            parent = Node(scene, "chain{}_joint{}".format(c, d), parent)
+            scene.selection.append(parent)
+
+
+def rename_with_cmds(renamer):
+    """Rename each node by its path, as Rename.execute used to"""
+
+    nodes = MGlobal.getActiveSelectionList()
+    short_names = [
+        nodes.getSelectionStrings(i)[0].split("|")[-1] for i in range(nodes.length())
+    ]
+    new_names = renamer.rename_all(short_names)
+    for i, new_name in enumerate(new_names):
+        full_path = nodes.getSelectionStrings(i)[0]
+        commands.rename(full_path, new_name)
+
+
+def rename_with_modifier(renamer):
+    from hotline.contexts import maya_rename
+
+    nodes = MGlobal.getActiveSelectionList()
+    objects = [nodes.getDependNode(i) for i in range(nodes.length())]
+    names = maya_rename.node_names(objects)
+    maya_rename.rename(objects, renamer.rename_all(names), names)
+
+
+def main(chains=200, depth=100):
+    install()
+    renamer = Renamer("arm_+ _joint _jnt +_##")
+    count = chains * depth
+    print("Renaming {} nodes in {} chains of {}".format(count, chains, depth))
+
+    results = []
+    for fn in (rename_with_cmds, rename_with_modifier):
+        build(chains, depth)
+        start = time.perf_counter()
+        fn(renamer)
+        duration = time.perf_counter() - start
+        results.append([node.name for node in scene.selection])
+        print(
+            "{:<22} {:8.1f} ms {:10.0f} nodes/s".format(
+                fn.__name__, duration * 1000, count / duration
+            )
+        )
+    assert results[0] == results[1]
+
+    # One undo restores every name
+    commands.undo.pop().undoIt()
+    assert scene.selection[-1].name == "chain{}_joint{}".format(chains - 1, depth - 1)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,52 @@
+"""Compare Renamer.rename_all against renaming one name at a time.
+
+.. usage::
+
+    python -m hotline.tests.bench_renamer [count]
+"""
+import sys
+import timeit
+
+from hotline.renamer import Renamer
+
+
+def rename_per_token(renamer, input_str, index):
+    """The per name path, calling each token then formatting"""
+
+    for token in renamer.tokens:
+        input_str = token(input_str)
+    indices = [v + index for v in renamer.start_values]
+    return input_str.format(*indices)
+
+
+def per_token(renamer, names):
+    return [rename_per_token(renamer, name, i) for i, name in enumerate(names)]
+
+
+def per_name(renamer, names):
+    return [renamer.rename(name, i) for i, name in enumerate(names)]
+
+
+def rename_many(renamer, names):
+    return list(renamer.rename_many(names))
+
+
+def rename_all(renamer, names):
+    return renamer.rename_all(names)
+
+
+def main(count=20000, repeat=5):
+    names = ["joint%d_old_JNT" % i for i in range(count)]
+    rename_str = "arm_+ _old _new -_JNT +_##(0) +_jnt"
+    renamer = Renamer(rename_str)
+
+    expected = per_token(renamer, names)
+    print("Renaming {} names with {!r}".format(count, rename_str))
+    for fn in (per_token, per_name, rename_many, rename_all):
+        assert fn(renamer, names) == expected
+        best = min(timeit.repeat(lambda: fn(renamer, names), number=1, repeat=repeat))
+        print("{:<12} {:8.2f} ms".format(fn.__name__, best * 1000))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
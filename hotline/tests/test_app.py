@@ -0,0 +1,170 @@
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from hotline.app import Hotline
+from hotline.command import Command
+from hotline.context import Context
+from hotline.history import ModeCommand
+from hotline.mode import Mode
+from hotline.utils import Executor, sleep_until
+from hotline.vendor.qtpy import QtCore, QtWidgets
+
+
+class Alpha(Mode):
+    name = "Alpha"
+    label = "A"
+
+    @property
+    def commands(self):
+        return [Command("alpha one", lambda: None)]
+
+    def execute(self, command):
+        return command
+
+
+class Beta(Alpha):
+    name = "Beta"
+    label = "B"
+
+
+class Gamma(Alpha):
+    # Named like Beta's label, labeled like Alpha
+    name = "B"
+    label = "A"
+
+    @property
+    def commands(self):
+        return [Command("gamma one", "gamma"), Command("gamma one", "other")]
+
+
+class TestContext(Context):
+    name = "TestContext"
+    modes = [Alpha, Beta]
+    parent = None
+    style = ""
+
+    def initialize(self, app):
+        pass
+
+
+class TestApp(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.home = os.environ.get("HOTLINE_HOME")
+        os.environ["HOTLINE_HOME"] = self.root
+        self.hotline = Hotline(TestContext)
+        self.hotline._standalone = False
+        self.hotline.init_ui()
+
+    def tearDown(self):
+        # Background reads and writes finish, and deliver their callbacks,
+        # before the databases are removed
+        self.hotline.frecency.wait()
+        self.hotline.history.wait()
+        Executor._execute()
+        self.hotline.ui.force_hide()
+        # Widgets are deleted here, a collection in a later test's worker
+        # thread would delete them off the GUI thread. Dialogs built by a
+        # pending warm-up timer would outlive the test.
+        dialogs = self.hotline.dialogs
+        sleep_until(lambda: len(dialogs._idle) >= dialogs.size, 1, interval=0.01)
+        dialogs = None
+        self.hotline = None
+        gc.collect()
+        if self.home is None:
+            os.environ.pop("HOTLINE_HOME")
+        else:
+            os.environ["HOTLINE_HOME"] = self.home
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_accept_history_search(self):
+        hotline = self.hotline
+        hotline.history.add(ModeCommand("Beta", "alpha two"))
+        hotline.history.add(ModeCommand("Alpha", "alpha one"))
+        boosts = {"alpha two": 100}
+        hotline.ui.commandlist.boosts = boosts
+
+        hotline.on_history_search()
+        commandlist = hotline.ui.commandlist
+        assert [m.text for m in commandlist.matches] == ["alpha one", "alpha two"]
+        assert commandlist.currentRow() == 0
+
+        # The highlighted result is accepted, whatever the mode's boosts
+        hotline.on_accept()
+        assert hotline.get_mode().name == "Alpha"
+        assert hotline.ui.input_field.text() == "alpha one"
+        assert hotline._search is None
+
+    def test_get_mode(self):
+        hotline = self.hotline
+        hotline.add_modes(Gamma)
+        modes = hotline.context.modes
+        alpha, beta, gamma = modes[0], modes[1], modes[-1]
+
+        # Names take precedence over labels, then earlier modes
+        assert hotline.get_mode("Alpha") is alpha
+        assert hotline.get_mode("B") is gamma
+        assert hotline.get_mode("A") is alpha
+        assert hotline.get_mode() is alpha
+        with self.assertRaises(NameError):
+            hotline.get_mode("Delta")
+
+        hotline.set_modes(Beta, Gamma)
+        beta, gamma = hotline.context.modes
+        with self.assertRaises(NameError):
+            hotline.get_mode("Alpha")
+        assert hotline.get_mode("A") is gamma
+        assert hotline.get_mode("B") is gamma
+        assert hotline.get_mode("Beta") is beta
+
+    def test_set_mode(self):
+        hotline = self.hotline
+        hotline.add_modes(Gamma)
+        modes = hotline.context.modes
+        alpha, beta, gamma = modes[0], modes[1], modes[-1]
+
+        # Gamma equals Alpha by label, it is found by identity
+        assert gamma == alpha
+        hotline.set_mode(gamma)
+        assert hotline.get_mode() is gamma
+        assert hotline.ui.commandlist.items == ["gamma one", "gamma one"]
+        hotline.set_mode("Alpha")
+        assert hotline.get_mode() is alpha
+        hotline.set_mode("B")
+        assert hotline.get_mode() is gamma
+        with self.assertRaises(Exception):
+            hotline.set_mode(Gamma(hotline))
+
+    def test_get_command(self):
+        gamma = Gamma(self.hotline)
+        assert gamma.get_command("gamma one").command == "gamma"
+        assert gamma.get_command("alpha one") is None
+        assert gamma("gamma one") == "gamma"
+
+    def test_history_navigation(self):
+        hotline = self.hotline
+        for item in [("Gone", "x"), ("Beta", "b"), ("Gone", "y"), ("Alpha", "a")]:
+            hotline.history.add(ModeCommand(*item))
+        text = hotline.ui.input_field.text
+
+        # Entries of modes not loaded in this session are skipped
+        with mock.patch.object(hotline, "refresh", wraps=hotline.refresh) as refresh:
+            hotline.on_history_prev()
+            assert hotline.get_mode().name == "Alpha" and text() == "a"
+            assert refresh.call_count == 1
+        hotline.on_history_prev()
+        assert hotline.get_mode().name == "Beta" and text() == "b"
+        hotline.on_history_prev()
+        assert hotline.get_mode().name == "Beta" and text() == "b"
+        hotline.on_history_next()
+        assert hotline.get_mode().name == "Alpha" and text() == "a"
+        hotline.on_history_next()
+        assert text() == ""
@@ -0,0 +1,71 @@
+import unittest
+
+from hotline.command import Command, CommandProvider
+
+
+class TestCommandProvider(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.builds = 0
+
+    def clock(self):
+        return self.now
+
+    def build(self):
+        self.builds += 1
+        return [Command("a", "a"), Command("b", "b"), Command("a", "a2")]
+
+    def test_commands(self):
+        provider = CommandProvider(self.build)
+        assert provider.version == 0
+        commands = provider.commands
+        assert provider.commands is commands
+        assert self.builds == 1 and provider.version == 1
+
+        # Names and the name index are derived once per build
+        names = provider.names
+        assert names == ["a", "b", "a"]
+        assert provider.names is names
+        assert provider.get("a").command == "a"
+        assert provider.get("b") is commands[1]
+        assert provider.get("c") is None
+        assert self.builds == 1
+
+    def test_invalidate(self):
+        provider = CommandProvider(self.build)
+        commands = provider.commands
+        names = provider.names
+        provider.invalidate()
+        assert self.builds == 1
+        assert provider.names is not names
+        assert provider.commands is not commands
+        assert self.builds == 2 and provider.version == 2
+
+    def test_ttl(self):
+        provider = CommandProvider(self.build, ttl=10, clock=self.clock)
+        commands = provider.commands
+        self.now = 10
+        assert provider.commands is commands
+        self.now = 11
+        assert provider.expired()
+        assert provider.get("b") is not commands[1]
+        assert self.builds == 2 and provider.version == 2
+
+        # Without a ttl commands are kept until invalidated
+        provider = CommandProvider(self.build, clock=self.clock)
+        provider.commands
+        self.now = 1e9
+        assert not provider.expired()
+
+        # A ttl of 0 rebuilds on every new tick
+        provider = CommandProvider(self.build, ttl=0, clock=self.clock)
+        provider.commands
+        self.now += 1
+        provider.commands
+        assert provider.version == 2
+
+    def test_empty(self):
+        provider = CommandProvider(lambda: None)
+        assert provider.commands == []
+        assert provider.names == []
+        assert provider.get("a") is None
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from hotline.frecency import *
+
+
+class TestFrecency(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "history.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_decay(self):
+        frecency = Frecency(self.path, half_life=10)
+        assert frecency.scores("Python") == {}
+
+        frecency.record("Python", "a", now=100)
+        frecency.record("Python", "a", now=100)
+        frecency.record("Python", "b", now=115)
+        assert frecency.score("Python", "a", now=110) == 1
+        assert frecency.score("Python", "b", now=115) == 1
+        assert frecency.score("Python", "c", now=110) == 0
+
+        boosts = frecency.boosts("Python", now=120)
+        assert boosts["b"] > boosts["a"]
+
+        # Bonuses are whole points, equal while the decay is small
+        assert boosts == {"a": 5, "b": 6}
+        assert frecency.boosts("Python", now=120.1) == boosts
+
+    def test_persistence(self):
+        frecency = Frecency(self.path, context="Maya", half_life=10)
+        frecency.record("Python", "a", now=100)
+        frecency.record("Python", "a", now=110)
+        frecency.wait()
+
+        other = Frecency(self.path, context="Maya", half_life=10)
+        other.load("Python").result()
+        assert other.score("Python", "a", now=110) == 1.5
+        assert Frecency(self.path, context="Win").scores("Python") == {}
+
+        # sessions sharing a database accumulate each other's uses
+        other.record("Python", "a", now=110)
+        other.wait()
+        third = Frecency(self.path, context="Maya", half_life=10)
+        third.load("Python").result()
+        assert third.score("Python", "a", now=110) == 2.5
+
+    def test_load(self):
+        frecency = Frecency(self.path, half_life=10)
+        frecency.record("Python", "a", now=100)
+        frecency.wait()
+
+        # Loading never blocks, uses recorded meanwhile are added to the read
+        loaded = []
+        other = Frecency(self.path, half_life=10, on_load=loaded.append)
+        other._writer.submit(time.sleep, 0.2)
+        assert other.scores("Python") == {}
+        other.record("Python", "a", now=110)
+        other.record("Python", "b", now=110)
+        assert other.score("Python", "a", now=110) == 1
+        other.wait()
+        assert loaded == ["Python"]
+        assert other.score("Python", "a", now=110) == 1.5
+        assert other.score("Python", "b", now=110) == 1
+
+    def test_prune(self):
+        frecency = Frecency(self.path, half_life=10)
+        frecency.record("Python", "old", now=100)
+        frecency.record("Python", "new", now=200)
+        frecency.wait()
+
+        # Opening the database deletes rows decayed below min_score
+        other = Frecency(self.path, half_life=10)
+        other.load("Python").result()
+        assert list(other.scores("Python")) == ["new"]
+        assert other.db.execute("SELECT COUNT(*) FROM usage").fetchone() == (1,)
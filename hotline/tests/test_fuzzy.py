@@ -0,0 +1,141 @@
+import unittest
+from unittest import mock
+
+from hotline import fuzzy
+from hotline.fuzzy import *
+
+
+class TestFuzzy(unittest.TestCase):
+    def test_score(self):
+        assert score("pc", "polyCube") is not None
+        assert score("cp", "polyCube") is None
+        assert score("", "polyCube") == (0, [])
+
+        _, spans = score("cube", "polyCube")
+        assert spans == [(4, 8)]
+
+        _, spans = score("pcu", "polyCube")
+        assert spans == [(0, 1), (4, 6)]
+
+    def test_score_bonuses(self):
+        # contiguous beats scattered
+        assert score("cube", "polyCube")[0] > score("cube", "clusterHandleUnitBend")[0]
+        # word boundaries beat mid-word matches
+        assert score("md", "multiplyDivide")[0] > score("md", "mmmdd")[0]
+        # prefix and exact matches rank highest
+        assert score("poly", "polyCube")[0] > score("poly", "aPolyCube")[0]
+        assert score("transform", "transform")[0] > score("transform", "transformGeometry")[0]
+
+    def test_matcher(self):
+        items = ["nurbsCube", "polyCylinder", "polyCube", "transform"]
+        matcher = Matcher(items)
+
+        results = matcher.match("cube")
+        assert [m.text for m in results] == ["polyCube", "nurbsCube"]
+        assert results[0].index == 2
+        assert results[0].spans == [(4, 8)]
+
+        assert [m.text for m in matcher.match("")] == items
+        assert matcher.match("xyz") == []
+
+    def test_matcher_indices(self):
+        matcher = Matcher(["nurbsCube", "polyCylinder", "polyCube", "transform"])
+        results = matcher.match("py", indices=[0, 2, 3])
+        assert [m.text for m in results] == ["polyCube"]
+
+    def test_matcher_special_characters(self):
+        matcher = Matcher(["a.b", "a[b]", "a\\b", "a-b"])
+        assert [m.text for m in matcher.match("[]")] == ["a[b]"]
+        assert [m.text for m in matcher.match("\\")] == ["a\\b"]
+        assert [m.text for m in matcher.match(".")] == ["a.b"]
+
+    def test_matcher_narrowing(self):
+        items = ["nurbsCube", "polyCylinder", "polyCube", "transform"]
+        matcher = Matcher(items)
+
+        cube = matcher.match("c")
+        narrowed = matcher.match("cub")
+        assert [m.text for m in narrowed] == ["polyCube", "nurbsCube"]
+        assert matcher.match("c") is cube
+
+        # diverging queries fall back to a full scan
+        assert [m.text for m in matcher.match("tr")] == ["transform"]
+
+        # new items reset the stack
+        matcher.items = ["cube"]
+        assert [m.text for m in matcher.match("cub")] == ["cube"]
+
+    def test_matcher_boosts(self):
+        items = ["nurbsCube", "polyCylinder", "polyCube", "transform"]
+        matcher = Matcher(items)
+        assert matcher.match("cub")[0].text == "polyCube"
+
+        matcher.boosts = {"nurbsCube": 100, "transform": 10}
+        assert [m.text for m in matcher.match("cub")] == ["nurbsCube", "polyCube"]
+        assert matcher.match("").texts == [
+            "nurbsCube",
+            "transform",
+            "polyCylinder",
+            "polyCube",
+        ]
+
+    def test_matcher_extend(self):
+        matcher = Matcher(["nurbsCube"])
+        assert [m.text for m in matcher.match("cube")] == ["nurbsCube"]
+
+        matcher.extend(["polyCube", "transform"])
+        matcher.extend([])
+        assert matcher.items == ["nurbsCube", "polyCube", "transform"]
+        assert [m.text for m in matcher.match("cube")] == ["polyCube", "nurbsCube"]
+        assert [m.index for m in matcher.match("tr")] == [2]
+
+        empty = Matcher()
+        empty.extend(["a"])
+        assert [m.text for m in empty.match("a")] == ["a"]
+
+    def test_matcher_extend_incremental(self):
+        matcher = Matcher(["nurbsCube", "transform"])
+        cube = matcher.match("cube")
+        unfiltered = matcher.match("")
+
+        # Only the new items are matched against the stacked queries
+        matches, rows = matcher.extend(["polyCube", "joint"], "cube")
+        assert [m.text for m in matches] == ["polyCube", "nurbsCube"]
+        assert rows == [0]
+        assert [m.text for m in cube] == ["nurbsCube"]
+        assert matcher.match("cube") is matches
+
+        matches, rows = matcher.extend(["cube"], "")
+        assert rows == [4]
+        assert len(matches) == 5 and len(unfiltered) == 2
+        assert matcher.extend(["x"], "joint") is None
+        assert matcher.extend([], "cube") is None
+
+        matcher.boosts = {"sphere": 10}
+        matcher.match("")
+        matches, rows = matcher.extend(["a", "sphere"], "")
+        assert rows == [0, 7]
+        assert matches.texts[:2] == ["sphere", "nurbsCube"]
+
+        # Keys are scanned in a logarithmic number of segments
+        matcher = Matcher()
+        for i in range(1000):
+            matcher.extend(["item{}".format(i)])
+        assert len(matcher._index.segments) <= 10
+        fresh = Matcher(matcher.items)
+        assert matcher.match("item99") == fresh.match("item99")
+
+    def test_matcher_segment_size(self):
+        # Segments are capped so a worker releases the GIL between scans
+        with mock.patch.object(fuzzy._Index, "segment_size", 4):
+            matcher = Matcher(["item{}".format(i) for i in range(10)])
+            matcher.extend(["item{}".format(i) for i in range(10, 30)])
+        segments = matcher._index.segments
+        assert all(segment.count <= 4 for segment in segments)
+        assert sum(segment.count for segment in segments) == 30
+        assert matcher.match("item2") == Matcher(matcher.items).match("item2")
+
+        calls = []
+        cancelled = lambda: calls.append(1) or len(calls) > 2
+        assert matcher.match("item", cancelled=cancelled) is None
+        assert len(calls) < len(segments)
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from hotline.history import *
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "history.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_navigation(self):
+        history = History(self.path, page_size=2)
+        assert history.prev() is None
+
+        for i in range(5):
+            history.add(ModeCommand("Python", "print(%d)" % i))
+
+        assert history.prev() == ("Python", "print(4)")
+        assert history.prev() == ("Python", "print(3)")
+        assert history.prev() == ("Python", "print(2)")
+        assert history.next() == ("Python", "print(3)")
+        for _ in range(10):
+            item = history.prev()
+        assert item == ("Python", "print(0)")
+        assert history.index == 5
+
+        for _ in range(5):
+            history.next()
+        assert history.next() is None
+        assert history.index == 0
+
+    def test_background_write(self):
+        history = History(self.path)
+        with history._lock:
+            # add returns without waiting for the database
+            future = history.add(ModeCommand("Python", "a"))
+            assert not future.done()
+        assert history.prev() == ("Python", "a")
+        assert future.done()
+
+    def test_insert(self):
+        history = History(self.path)
+        history.add(ModeCommand("Python", "a"))
+        history.insert(1, ModeCommand("Python", "partial"))
+        assert history.index == 1
+        assert history.prev() == ("Python", "a")
+        assert history.next() == ("Python", "partial")
+        assert history.next() is None
+
+        # pending items are not persisted
+        history.add(ModeCommand("Python", "b")).result()
+        assert [e.command for e in History(self.path).entries()] == ["b", "a"]
+
+    def test_persistence(self):
+        first = History(self.path, context="Maya")
+        second = History(self.path, context="Maya")
+        other = History(self.path, context="Windows")
+
+        # Writes are in the background, other instances see them once done
+        first.add(ModeCommand("Python", "a"), duration=0.5).result()
+        second.add(ModeCommand("Mel", "b"), success=False).result()
+        other.add(ModeCommand("Run", "c")).result()
+
+        entries = History(self.path, context="Maya").entries()
+        assert [(e.mode, e.command, e.success) for e in entries] == [
+            ("Mel", "b", 0),
+            ("Python", "a", 1),
+        ]
+        assert entries[1].duration == 0.5
+
+        # failed commands are recorded but not navigated
+        history = History(self.path, context="Maya")
+        assert history.prev() == ("Python", "a")
+        assert history.prev() == ("Python", "a")
+
+    def test_compact(self):
+        history = History(self.path, max_entries=3)
+        for i in range(10):
+            history.add(ModeCommand("Python", str(i)))
+        history.compact()
+        assert [e.command for e in history.entries()] == ["9", "8", "7"]
+
+        # The least recently used commands and their grams are compacted too
+        for i in range(5):
+            history.add(ModeCommand("Python", "command{}".format(i)))
+        history.add(ModeCommand("Python", "command0"))
+        history.compact()
+        db = history.db
+        commands = db.execute("SELECT command FROM commands ORDER BY id").fetchall()
+        assert commands == [("command0",), ("command3",), ("command4",)]
+        assert db.execute("SELECT COUNT(*) FROM grams").fetchone() == (18,)
+        assert history.search("command2") == []
+
+    def test_mode_objects(self):
+        class Mode(object):
+            name = "Python"
+
+        history = History(self.path)
+        history.add(ModeCommand(Mode(), "a"))
+        assert history.prev() == ("Python", "a")
+
+    def test_search(self):
+        history = History(self.path, context="Maya")
+        history.add(ModeCommand("Python", "cmds.polyCube()"))
+        history.add(ModeCommand("Mel", "polyCube"))
+        history.add(ModeCommand("Python", "cmds.ls()"))
+        history.add(ModeCommand("Python", "cmds.polyCube()"))
+        history.add(ModeCommand("Python", "polySphere"), success=False)
+        History(self.path, context="Win").add(ModeCommand("Run", "polycube")).result()
+
+        assert history.search("POLYC") == [
+            ("Python", "cmds.polyCube()"),
+            ("Mel", "polyCube"),
+        ]
+        assert history.search("ls") == [("Python", "cmds.ls()")]
+        assert history.search("sphere") == []
+        assert len(history.search("", limit=2)) == 2
+
+        # past the search window queries use the trigram index
+        history.search_window = 0
+        assert history.search("s.l") == [("Python", "cmds.ls()")]
+        assert history.search("ube()") == [("Python", "cmds.polyCube()")]
+
+    def test_search_backfill(self):
+        history = History(self.path)
+        history.add(ModeCommand("Python", "a")).result()
+        with history.db as db:
+            db.execute("DELETE FROM commands")
+            db.execute("DELETE FROM grams")
+        history.close()
+
+        history = History(self.path)
+        history.search_window = 0
+        assert history.search("a") == [("Python", "a")]
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+from concurrent.futures import CancelledError
+
+from hotline.jobs import *
+from hotline.vendor.qtpy import QtCore, QtWidgets
+
+
+class TestJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def test_submit(self):
+        pool = JobPool(max_workers=2)
+        job = pool.submit("name", lambda a: (a, current_job()), 1)
+        assert job.result(timeout=1) == (1, job)
+        assert current_job() is None
+        assert str(job) == "name"
+
+        job = pool.submit("error", lambda: 1 / 0)
+        assert isinstance(job.exception(timeout=1), ZeroDivisionError)
+
+    def test_max_workers(self):
+        pool = JobPool(max_workers=2)
+        release = threading.Event()
+        running = []
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running.append(threading.current_thread())
+            release.wait(2)
+
+        jobs = [pool.submit(str(i), work) for i in range(4)]
+        time.sleep(0.2)
+        assert len(running) == 2
+        release.set()
+        for job in jobs:
+            job.result(timeout=1)
+        assert len(running) == 4
+
+    def test_cancel(self):
+        pool = JobPool(max_workers=1)
+        started = threading.Event()
+        killed = []
+
+        def work():
+            job = current_job()
+            job.on_cancel(lambda: killed.append(True))
+            started.set()
+            while True:
+                job.check()
+                time.sleep(0.01)
+
+        running = pool.submit("running", work)
+        queued = pool.submit("queued", work)
+        started.wait(1)
+
+        assert pool.cancel() is queued
+        assert queued.cancelled()
+        assert pool.cancel() is running
+        assert isinstance(running.exception(timeout=1), CancelledError)
+        assert killed == [True]
+        assert running.cancel() is False
+        assert pool.cancel() is None
+
+    def test_report(self):
+        pool = JobPool()
+        job = pool.submit("progress", lambda: current_job().report(1, 4, "one"))
+        job.result(timeout=1)
+        assert job.progress == (1, 4, "one")
+        assert job.percent == 25
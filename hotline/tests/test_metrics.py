@@ -0,0 +1,62 @@
+import json
+import unittest
+
+from hotline.metrics import *
+
+MS = 1000000
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram()
+        assert histogram.quantile(0.5) is None
+        for ms in (1, 2, 3, 4, 100):
+            histogram.observe(ms * MS)
+
+        assert histogram.count == 5
+        assert histogram.min == 1 * MS
+        assert histogram.max == 100 * MS
+        assert 1 * MS <= histogram.quantile(0.5) <= 5 * MS
+        assert histogram.quantile(1) == 100 * MS
+
+    def test_observe(self):
+        metrics = Metrics()
+        metrics.observe("execute", 2 * MS, "Python", "print(1)")
+        metrics.observe("execute", 4 * MS, "Python", "print(2)")
+        with metrics.timer("filter"):
+            pass
+
+        assert metrics.get("execute").count == 2
+        assert metrics.get("execute", "Python").sum == 6 * MS
+        assert metrics.get("execute", "Python", "print(2)").count == 1
+        assert metrics.get("filter").count == 1
+        assert metrics.last["execute"] == ("execute", "Python", "print(2)", 4 * MS)
+
+    def test_max_commands(self):
+        metrics = Metrics(max_commands=1)
+        metrics.observe("execute", MS, "Python", "a")
+        metrics.observe("execute", MS, "Python", "b")
+        metrics.observe("execute", MS, "Python", "a")
+        assert metrics.get("execute", "Python", "a").count == 2
+        assert metrics.get("execute", "Python", "b") is None
+        assert metrics.get("execute", "Python", "<other>").count == 1
+
+    def test_export(self):
+        metrics = Metrics()
+        metrics.observe("execute", 3 * MS, "Python", 'print("a")')
+
+        data = json.loads(metrics.to_json())
+        assert [(d["mode"], d["count"]) for d in data] == [
+            ("", 1),
+            ("Python", 1),
+            ("Python", 1),
+        ]
+        assert data[2]["sum_ms"] == 3
+
+        text = metrics.to_prometheus()
+        assert "# TYPE hotline_phase_seconds histogram" in text
+        labels = 'phase="execute",mode="Python",command="print(\\"a\\")"'
+        assert 'hotline_phase_seconds_bucket{%s,le="0.0025"} 0' % labels in text
+        assert 'hotline_phase_seconds_bucket{%s,le="0.005"} 1' % labels in text
+        assert 'hotline_phase_seconds_bucket{%s,le="+Inf"} 1' % labels in text
+        assert "hotline_phase_seconds_count{%s} 1" % labels in text
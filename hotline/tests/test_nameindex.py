@@ -0,0 +1,102 @@
+import re
+import unittest
+
+from hotline.nameindex import NameIndex, literals
+
+
+class TestNameIndex(unittest.TestCase):
+    def test_literals(self):
+        data = [
+            ("abc", ("abc", ["abc"])),
+            ("^L_arm.*_JNT$", ("L_arm", ["L_arm", "_JNT"])),
+            ("ab+c", ("ab", ["ab", "c"])),
+            ("abc?d", ("ab", ["ab", "d"])),
+            ("a\\.b\\d", ("a.b", ["a.b"])),
+            ("(abc)def", ("", ["def"])),
+            ("(\\.\\.\\.)?abc", ("", ["abc"])),
+            ("x[abc]yz", ("x", ["x", "yz"])),
+            ("pCube\\d+", ("pCube", ["pCube"])),
+            ("abc|def", ("", [])),
+            ("(?i)abc", ("", [])),
+            ("\\x41bcd", ("", ["bcd"])),
+            ("a\\u0041bc", ("a", ["a", "bc"])),
+            ("\\U00000041bc", ("", ["bc"])),
+            ("\\101bc", ("", ["bc"])),
+            ("\\0bc", ("", ["bc"])),
+            ("(a)\\1bc", ("", ["bc"])),
+            ("\\N{LATIN CAPITAL LETTER A}bc", ("", ["bc"])),
+        ]
+
+        for pattern, result in data:
+            assert literals(pattern) == result, pattern
+
+    def test_match(self):
+        names = [
+            "L_arm_JNT",
+            "R_arm_JNT",
+            "L_leg_JNT",
+            "L_arm_CTL",
+            "pCube1",
+            "pCube12",
+            "pCubeShape1",
+        ]
+        index = NameIndex()
+        for key, name in enumerate(names):
+            index.add(key, name)
+
+        patterns = [
+            "L_arm.*",
+            ".*_JNT",
+            "L_.*_JNT",
+            "pCube\\d+$",
+            "pCube(Shape)?1",
+            "arm",
+            ".*",
+            "[LR]_arm_JNT",
+            "L_arm|pCube",
+        ]
+        for pattern in patterns:
+            expected = [k for k, n in enumerate(names) if re.match(pattern, n)]
+            assert sorted(index.match(pattern)) == expected, pattern
+
+        index.add(6, "Abcdef")
+        assert index.match(r"\x41bcd") == [6]
+        assert index.match(r"\101bc") == [6]
+        index.remove(6)
+
+        index.add(7, "...abc")
+        index.add(8, "abc")
+        assert sorted(index.match(r"(\.\.\.)?abc")) == [7, 8]
+        index.remove(7)
+        index.remove(8)
+
+        assert sorted(index.match("l_ARM.*", re.IGNORECASE)) == [0, 3]
+        assert sorted(index.search("arm_")) == [0, 1, 3]
+        assert sorted(index.search("Cube1")) == [4, 5]
+        assert index.match(".*_JNT", among=[1, 3, 9]) == [1]
+
+    def test_update(self):
+        index = NameIndex()
+        index.add("a", "joint1")
+        index.add("b", "joint1")
+        index.add("c", "joint2")
+        assert len(index) == 3
+        assert index.keys("joint1") == {"a", "b"}
+
+        index.rename("a", "bone1")
+        assert index.name("a") == "bone1"
+        assert index.keys("joint1") == {"b"}
+        assert index.match("bone") == ["a"]
+
+        index.remove("b")
+        index.remove("missing")
+        assert "b" not in index
+        assert sorted(index.match("joint")) == ["c"]
+
+        # Removed names are compacted away once they outnumber live ones
+        for i in range(10):
+            index.add(i, "node{}".format(i))
+        for i in range(10):
+            index.remove(i)
+        assert len(index._by_id) < 10
+        assert sorted(index.match(".*")) == ["a", "c"]
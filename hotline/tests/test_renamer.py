@@ -56,7 +56,121 @@ class TestRenamer(unittest.TestCase):
             assert preprocess_string(in_str) == result
 
     def test_tokenize_string(self):
-        assert False
+
+        data = [
+            ("name", [FullRenameToken]),
+            ("a b", [SubstituteToken]),
+            ("-rem", [RemoveToken]),
+            ("+_suff", [AddSuffixToken]),
+            ("pre_+", [AddPrefixToken]),
+            (
+                "pre_+ a b -rem c d +_suff",
+                [
+                    AddPrefixToken,
+                    SubstituteToken,
+                    RemoveToken,
+                    SubstituteToken,
+                    AddSuffixToken,
+                ],
+            ),
+            ("-rem+", [RemoveToken]),
+            ("+_suff+", [AddSuffixToken]),
+        ]
+
+        for in_str, result in data:
+            assert [type(t) for t in tokenize(in_str)] == result
+
+        for bad in ["a +b", "a b c", "a_{0:0>2} +b"]:
+            self.assertRaises(TokenError, tokenize, bad)
+
+        self.assertRaises(TokenError, Renamer, "a -b c")
+
+    def test_parse_cache(self):
+        assert parse("pre_+ +_##") is parse("pre_+ +_##")
+        a = Renamer("pre_+ +_##")
+        b = Renamer("pre_+ +_##")
+        assert a.tokens == b.tokens
+        assert a.tokens is not b.tokens
+        assert a.start_values == [1]
 
     def test_renamer(self):
-        assert False
+
+        data = [
+            ("new_name", "old", 0, "new_name"),
+            ("pre_+", "name", 0, "pre_name"),
+            ("+_suff", "name", 0, "name_suff"),
+            ("-_old", "name_old", 0, "name"),
+            ("a b", "cat_a", 0, "cbt_b"),
+            ("pre_+ _old _new +_##", "name_old", 0, "pre_name_new_01"),
+            ("+_###(10)", "name", 4, "name_014"),
+            ("joint_##", "old", 2, "joint_03"),
+        ]
+
+        for rename_str, in_str, index, result in data:
+            assert Renamer(rename_str).rename(in_str, index) == result
+
+        r = Renamer("+_##")
+        assert r.rename("name") == "name_{0:0>2}"
+
+        names = ["a", "b", "c"]
+        assert list(r.rename_many(names)) == ["a_01", "b_02", "c_03"]
+        assert r.rename_all(names, start=9) == ["a_10", "b_11", "c_12"]
+        assert r.rename_all(names) == [r.rename(n, i) for i, n in enumerate(names)]
+
+        r = Renamer("it's \"q\" +_\\'")
+        assert r.rename_all(["it's"]) == ["\"q\"_\\'"]
+
+    def test_plan_renames(self):
+        def apply(names, plan, scopes=None):
+            names = list(names)
+            scopes = scopes or [None] * len(names)
+            for i, name in plan:
+                key = (scopes[i], name)
+                assert key not in set(zip(scopes, names)), name
+                names[i] = name
+            return names
+
+        names = ["a", "b", "c"]
+        assert plan_renames(names, names) == []
+        assert plan_renames(names, ["x", "b", "y"]) == [(0, "x"), (2, "y")]
+
+        # Swapped names move through a temporary name
+        plan = plan_renames(names, ["b", "a", "c"])
+        assert len(plan) == 4
+        assert apply(names, plan) == ["b", "a", "c"]
+
+        # Duplicates and names taken by other nodes get a free suffix
+        exists = lambda name, scope: name in ("x", "x1")
+        plan = plan_renames(names, ["x", "x", "b"], exists)
+        assert apply(names, plan) == ["x2", "x3", "b"]
+        assert plan_renames(["joint5", "a"], ["joint5", "joint5"]) == [(1, "joint6")]
+
+        # Names only collide within a scope
+        scopes = ["p", "q", "p"]
+        plan = plan_renames(names, ["x", "x", "x"], scopes=scopes)
+        assert apply(names, plan, scopes) == ["x", "x", "x1"]
+
+    def test_rename_preview(self):
+        names = ["a_old", "b_old", "c", "taken"]
+        preview = RenamePreview(names, exists=lambda name: name == "other")
+
+        assert len(preview) == 4
+        assert list(preview.update("")) == names
+        assert preview.update("-_old")[0] == "a_old -> a"
+        assert preview[2] == "c"
+
+        preview.update("_old _new +_##")
+        assert preview[1] == "b_old -> b_new_02"
+        assert preview[2] == "c -> c_03"
+
+        # Renamed to an unchanged name, to an unselected node and to a name
+        # that stays taken by a selected node
+        preview.update("b_old a_old")
+        assert preview.collision(0) is None
+        assert preview[1] == "b_old -> a_old (duplicate)"
+        assert preview.update("c other")[2] == "c -> other (exists)"
+        assert preview.update("c taken")[2] == "c -> taken (duplicate)"
+        assert preview.update("a_old taken b_old a_old")[0] == "a_old -> taken (duplicate)"
+
+        assert list(preview.update("a +b")) == names
+        assert preview.error
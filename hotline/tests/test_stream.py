@@ -0,0 +1,65 @@
+import io
+import sys
+import threading
+import unittest
+
+from hotline.stream import *
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.streams = sys.stdout, sys.stderr
+        sys.stdout = io.StringIO()
+        sys.stderr = io.StringIO()
+        self.main = sys.stdout, sys.stderr
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self.streams
+
+    def test_capture(self):
+        out = io.StringIO()
+        err = io.StringIO()
+        started = threading.Event()
+        resume = threading.Event()
+        seen = []
+
+        def worker():
+            invocation = Invocation("Python", "cmd")
+            with capture(out, err, invocation):
+                print("worker out")
+                started.set()
+                resume.wait(5)
+                print("worker err", file=sys.stderr)
+                seen.append((current_invocation(), current_capture()))
+            seen.append((current_invocation(), current_capture()))
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        started.wait(5)
+        # The main thread writes to its own streams while the worker captures
+        print("main out")
+        print("main err", file=sys.stderr)
+        assert current_capture() is None
+        resume.set()
+        thread.join()
+
+        assert out.getvalue() == "worker out\n"
+        assert err.getvalue() == "worker err\n"
+        assert self.main[0].getvalue() == "main out\n"
+        assert self.main[1].getvalue() == "main err\n"
+        invocation = seen[0][0]
+        assert seen == [(invocation, (out, err, invocation)), (None, None)]
+
+    def test_nested_capture(self):
+        outer = io.StringIO()
+        inner = io.StringIO()
+        with capture(outer):
+            print("a")
+            with capture(inner):
+                print("b", file=sys.stderr)
+            print("c", file=sys.stderr)
+        print("d")
+
+        assert outer.getvalue() == "a\nc\n"
+        assert inner.getvalue() == "b\n"
+        assert self.main[0].getvalue() == "d\n"
@@ -0,0 +1,84 @@
+import threading
+import unittest
+from concurrent.futures import CancelledError
+
+from hotline.task import *
+from hotline.utils import sleep_until
+from hotline.vendor.qtpy import QtCore, QtWidgets
+
+
+class TestTask(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def wait(self, future):
+        sleep_until(future.done, timeout=2, interval=0.01)
+        assert future.done()
+
+    def test_generator(self):
+        first, second = Future(), Future()
+
+        def command():
+            a = yield first
+            b = yield second
+            return a + b
+
+        task = Task(command()).start()
+        assert task.waiting is first
+        first.set_result(1)
+        threading.Thread(target=second.set_result, args=(2,)).start()
+        self.wait(task)
+        assert task.result() == 3
+
+    def test_coroutine(self):
+        future = Future()
+        plain = Future()
+
+        async def command():
+            a = await future
+            b = await wait(plain)
+            return a, b
+
+        task = Task(command()).start()
+        future.set_result("a")
+        plain.set_result("b")
+        self.wait(task)
+        assert task.result() == ("a", "b")
+
+    def test_exceptions(self):
+        future = Future()
+
+        def command():
+            try:
+                yield future
+            except ValueError:
+                pass
+            raise KeyError("failed")
+
+        task = Task(command()).start()
+        future.set_exception(ValueError())
+        self.wait(task)
+        assert isinstance(outcome(task), KeyError)
+
+        def invalid():
+            yield 1
+
+        task = Task(invalid()).start()
+        assert isinstance(task.exception(), TypeError)
+
+    def test_cancel(self):
+        future = Future()
+        closed = []
+
+        def command():
+            try:
+                yield future
+            finally:
+                closed.append(True)
+
+        task = Task(command()).start()
+        assert task.cancel()
+        assert future.cancelled()
+        assert closed
+        assert isinstance(outcome(task), CancelledError)
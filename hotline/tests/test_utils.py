@@ -0,0 +1,150 @@
+import sys
+import threading
+import time
+import unittest
+
+from hotline.utils import *
+from hotline.utils import event_loop
+from hotline.vendor.qtpy import QtCore, QtWidgets
+
+
+class TestUtils(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def test_qt_sleep(self):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        qt_sleep(2)
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+
+        assert wall >= 1.9
+        assert cpu < 0.5, "qt_sleep used %0.2fs of CPU time" % cpu
+
+    def test_qt_sleep_processes_events(self):
+        called = []
+        QtCore.QTimer.singleShot(10, lambda: called.append(True))
+        qt_sleep(0.1)
+        assert called
+
+    def test_sleep_until(self):
+        state = {"awake": False}
+
+        def wake():
+            state["awake"] = True
+
+        QtCore.QTimer.singleShot(200, wake)
+        cpu = time.process_time()
+        sleep_until(lambda: state["awake"], timeout=5, interval=0.01)
+        assert state["awake"]
+        assert time.process_time() - cpu < 0.5
+
+    def test_sleep_until_timeout(self):
+        start = time.perf_counter()
+        sleep_until(lambda: False, timeout=0.2)
+        assert 0.15 < time.perf_counter() - start < 1
+
+    def test_event_loop_signals(self):
+        timer = QtCore.QTimer()
+        timer.setSingleShot(True)
+        start = time.perf_counter()
+        with event_loop(timeout=5000, signals=[timer.timeout]):
+            timer.start(100)
+        assert time.perf_counter() - start < 1
+
+    def test_executor(self):
+        futures = []
+        main_threads = []
+
+        def work(i):
+            main_threads.append(threading.current_thread() is threading.main_thread())
+            return i * 2
+
+        def worker():
+            for i in range(100):
+                futures.append(execute_in_main_thread(work, i))
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        assert len(Executor.queue) == 100
+
+        sleep_until(lambda: all(f.done() for f in futures), timeout=5, interval=0.01)
+        assert [f.result() for f in futures] == [i * 2 for i in range(100)]
+        assert all(main_threads)
+
+    def test_executor_exception(self):
+        future = execute_in_main_thread(lambda: 1 / 0)
+        sleep_until(future.done, timeout=5, interval=0.01)
+        assert isinstance(future.exception(), ZeroDivisionError)
+
+    def test_executor_coalesce(self):
+        calls = []
+        first = Executor.coalesce("key", calls.append, 1)
+        second = Executor.coalesce("key", calls.append, 2)
+        other = Executor.execute(calls.append, 3)
+        assert first is second
+
+        sleep_until(lambda: first.done() and other.done(), timeout=5, interval=0.01)
+        assert calls == [2, 3]
+
+        third = Executor.coalesce("key", calls.append, 4)
+        assert third is not first
+        sleep_until(third.done, timeout=5, interval=0.01)
+        assert calls == [2, 3, 4]
+
+    def python(self, code):
+        return sys.executable, "-c", code
+
+    def test_process(self):
+        stdout = []
+        stderr = []
+        code = "import sys; print('a'); print('b', file=sys.stderr); print('c')"
+        process = Process(
+            *self.python(code),
+            shell=False,
+            on_stdout=stdout.append,
+            on_stderr=stderr.append,
+        )
+        result = process.start().wait(10)
+        assert result.returncode == 0
+        assert stdout == ["a\n", "c\n"]
+        assert stderr == ["b\n"]
+        assert result.stdout == "a\nc\n"
+        assert not result.timed_out and not result.cancelled
+        assert process.wait() is result
+
+        result = Process(*self.python("raise SystemExit(3)"), shell=False)
+        assert result.start().wait(10).returncode == 3
+
+    def test_process_cancel(self):
+        process = Process(*self.python("import time; time.sleep(30)"), shell=False)
+        process.start()
+        assert process.running
+        assert process.wait(0.1) is None
+
+        process.cancel()
+        result = process.wait(10)
+        assert result.cancelled
+        assert result.returncode != 0
+        assert not process.running
+
+    def test_run_process(self):
+        result = run_process(*self.python("print('done')"), shell=False, timeout=10)
+        assert result.stdout == "done\n"
+        assert not result.timed_out
+
+        code = "import time; print('started', flush=True); time.sleep(30)"
+        result = run_process(*self.python(code), shell=False, timeout=0.5)
+        assert result.timed_out and not result.cancelled
+        assert result.stdout == "started\n"
+        assert result.duration < 10
+
+    def test_new_process(self):
+        code = "import sys; print('out'); print('err', file=sys.stderr)"
+        assert new_process(*self.python(code), shell=False) == ("out\n", "err\n")
+
+        code = "import time; time.sleep(1)"
+        assert new_process(*self.python(code), shell=False, timeout=0.1) is None
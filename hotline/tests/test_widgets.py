@@ -0,0 +1,301 @@
+import threading
+import unittest
+from unittest import mock
+
+from hotline import widgets
+from hotline.utils import qt_sleep, sleep_until
+from hotline.fuzzy import Matcher
+from hotline.vendor.qtpy import QtCore, QtGui, QtWidgets
+from hotline.widgets import (
+    CommandDelegate,
+    CommandModel,
+    Console,
+    Dialog,
+    DialogPool,
+)
+
+
+class TestConsole(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def test_flush(self):
+        console = Console()
+        console.write("a\n")
+
+        def worker():
+            for i in range(100):
+                console.write("{}\n".format(i))
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        console.write("b", tag="job")
+        console.write("c\n", tag="job")
+        console.write(1)
+
+        # Output is buffered until the next flush
+        assert console.output.toPlainText() == ""
+        qt_sleep(console.flush_interval * 0.005)
+
+        # A header is written when the tag changes, untagged output has none
+        lines = ["a"] + [str(i) for i in range(100)] + ["# job", "bc"]
+        assert console.output.toPlainText() == "\n".join(lines) + "\n1"
+
+    def test_flush_limit(self):
+        console = Console(max_blocks=10)
+        for i in range(100):
+            console.write("{}\n".format(i))
+        console.flush()
+        lines = console.output.toPlainText().split("\n")
+        assert lines == [str(i) for i in range(91, 100)] + [""]
+
+
+class TestCommandList(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def setUp(self):
+        self.dialog = Dialog()
+        self.commandlist = self.dialog.commandlist
+        self.commandlist.items = ["nurbsCube", "polyCube", "transform", "joint"]
+
+    def tearDown(self):
+        self.dialog.force_hide()
+        self.dialog.deleteLater()
+
+    def texts(self):
+        return [m.text for m in self.commandlist.matches]
+
+    def wait(self):
+        sleep_until(lambda: self.commandlist._pending is None, 2, interval=0.01)
+
+    def test_request_filter_sync(self):
+        # Small lists are filtered on the keystroke
+        self.commandlist.request_filter("cube")
+        assert self.texts() == ["polyCube", "nurbsCube"]
+        assert self.commandlist.currentRow() == 0
+
+    def test_request_filter_debounce(self):
+        commandlist = self.commandlist
+        commandlist.sync_threshold = 0
+        commandlist._filter_time = 0.05
+        with mock.patch.object(
+            widgets.filter_pool, "submit", wraps=widgets.filter_pool.submit
+        ) as submit:
+            commandlist.request_filter("c")
+            commandlist.request_filter("cu")
+            commandlist.request_filter("cube")
+            assert len(self.texts()) == 4
+            self.wait()
+        # Only the last query of a burst is scored
+        assert submit.call_count == 1
+        assert submit.call_args[0][2] == "cube"
+        assert self.texts() == ["polyCube", "nurbsCube"]
+
+        # Empty queries are never deferred
+        commandlist.request_filter(" ")
+        assert len(self.texts()) == 4
+
+    def test_request_filter_stale(self):
+        commandlist = self.commandlist
+        commandlist.sync_threshold = 0
+        commandlist.request_filter("cube")
+        generation = commandlist._generation
+        stale = commandlist.matcher.match("cube")
+        commandlist.request_filter("joint")
+
+        # Results of a superseded request are dropped
+        commandlist._finish_filter("cube", generation, stale, 0)
+        assert len(self.texts()) == 4
+        assert commandlist._pending == "joint"
+        self.wait()
+        assert self.texts() == ["joint"]
+
+        # A job whose generation was superseded stops without a result
+        with mock.patch.object(widgets, "execute_in_main_thread") as execute:
+            commandlist._filter_job(commandlist.matcher, "cube", generation)
+        assert not execute.called
+
+    def test_flush(self):
+        commandlist = self.commandlist
+        commandlist.sync_threshold = 0
+        commandlist.max_debounce = 1000
+        commandlist._filter_time = 1
+        commandlist.request_filter("trans")
+        commandlist.request_filter("joint")
+        commandlist.flush()
+        assert commandlist._pending is None
+        assert self.texts() == ["joint"]
+
+        # The debounced request does not run after the flush
+        qt_sleep(0.05)
+        assert not commandlist._debounce.isActive()
+        assert self.texts() == ["joint"]
+
+    def test_visible_rows(self):
+        commandlist = self.commandlist
+        height = self.dialog._height
+        assert commandlist.count() == commandlist.visible_count() == 4
+        assert commandlist._get_geometry().height() == int(height * 4)
+
+        commandlist.filter("cube")
+        assert commandlist.count() == commandlist.model().rowCount() == 2
+        assert commandlist._get_geometry().height() == int(height * 2)
+
+        # New items matching the query are counted as they arrive
+        commandlist.lineedit.setText("cube")
+        commandlist.extend(["cubeArray", "sphere"])
+        assert commandlist.count() == commandlist.model().rowCount() == 3
+        assert "cubeArray" in self.texts()
+
+        commandlist.filter("nothing")
+        assert commandlist.count() == 0
+        assert commandlist._get_geometry().width() == 0
+
+        commandlist.items = ["item{}".format(i) for i in range(20)]
+        assert commandlist.count() == 20
+        assert commandlist._get_geometry().height() == int(
+            height * commandlist.max_visible
+        )
+
+    def test_select(self):
+        commandlist = self.commandlist
+        commandlist.filter("cube")
+        assert commandlist.currentRow() == 0
+        assert commandlist.selected_text() == "polyCube"
+
+        # Selection stops at the last row
+        commandlist.select_next()
+        commandlist.select_next()
+        assert commandlist.currentRow() == 1
+        assert commandlist.selected_text() == "nurbsCube"
+
+        # Moving up past the first row clears the selection
+        commandlist.select_prev()
+        commandlist.select_prev()
+        assert commandlist.currentRow() == -1
+        assert commandlist.selected_text() is None
+        commandlist.select_next()
+        assert commandlist.currentRow() == 0
+
+    def test_boosts(self):
+        commandlist = self.commandlist
+        commandlist.boosts = {"joint": 5}
+        matches = commandlist.matcher.match("t")
+
+        # Equal boosts keep the cached results and the pending filter
+        commandlist.sync_threshold = 0
+        commandlist.request_filter("t")
+        commandlist.boosts = {"joint": 5}
+        assert commandlist.matcher.match("t") is matches
+        assert commandlist._pending == "t"
+
+        commandlist.boosts = {"joint": 6}
+        assert commandlist.matcher.match("t") is not matches
+        assert commandlist._pending is None
+
+
+class TestCommandModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def test_set_matches(self):
+        model = CommandModel()
+        matches = Matcher(["nurbsCube", "polyCube", "joint"]).match("cube")
+        model.set_matches(matches)
+        assert model.rowCount() == 2
+        assert model.data(model.index(0)) == "polyCube"
+        assert model.data(model.index(1), CommandModel.SpansRole) == [(5, 9)]
+        assert model.data(QtCore.QModelIndex(), CommandModel.SpansRole) is None
+
+    def test_insert_matches(self):
+        model = CommandModel()
+        model.insert_batch = 2
+        matcher = Matcher(["b", "d"])
+        model.set_matches(matcher.match(""))
+        matches, rows = matcher.extend(["a", "c", "e", "f", "g"], "")
+        model.insert_matches(matches, rows)
+        assert model.stringList() == [m.text for m in matches]
+        assert model.matches is matches
+
+    def test_delegate(self):
+        model = CommandModel()
+        model.set_matches(Matcher(["nurbsCube"]).match("cube"))
+        delegate = CommandDelegate()
+
+        def paint(spans):
+            model.matches[0] = model.matches[0]._replace(spans=spans)
+            image = QtGui.QImage(200, 20, QtGui.QImage.Format_ARGB32)
+            image.fill(QtCore.Qt.white)
+            option = QtWidgets.QStyleOptionViewItem()
+            option.rect = QtCore.QRect(0, 0, 200, 20)
+            option.palette.setColor(QtGui.QPalette.Text, QtCore.Qt.black)
+            painter = QtGui.QPainter(image)
+            delegate.paint(painter, option, model.index(0))
+            painter.end()
+            return image
+
+        # Matched characters are underlined
+        assert paint([(5, 9)]) != paint([])
+        assert paint([(5, 9)]) != paint([(0, 4)])
+
+
+class TestDialogPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtWidgets.QApplication([])
+
+    def setUp(self):
+        self.pool = DialogPool(style="QWidget {}", size=1)
+
+    def tearDown(self):
+        for dialog in self.pool._idle + list(self.pool._busy):
+            dialog.deleteLater()
+
+    def test_acquire(self):
+        pool = self.pool
+        first = pool.acquire()
+        second = pool.acquire()
+        assert first is not second
+        assert first.styleSheet() == "QWidget {}"
+
+        # Released Dialogs are reset and reused, up to size of them
+        first.pinned = True
+        first.commandlist.filtering = False
+        first.commandlist.items = ["a", "b"]
+        first.input_field.setText("a")
+        first.input_field.setPlaceholderText("prompt")
+        pool.release(first)
+        pool.release(second)
+        assert pool._idle == [first] and not pool._busy
+        assert not first.pinned
+        assert first.commandlist.filtering
+        assert first.commandlist.count() == 0
+        assert first.input_field.text() == ""
+        assert first.input_field.placeholderText() == ""
+        assert pool.acquire() is first
+
+    def test_warm(self):
+        pool = self.pool
+        pool.size = 2
+        pool.warm()
+        assert not pool._idle
+        sleep_until(lambda: len(pool._idle) == 2, 2, interval=0.01)
+        assert len(pool._idle) == 2
+        qt_sleep(0.01)
+        assert len(pool._idle) == 2
+
+    def test_set_style(self):
+        pool = self.pool
+        idle = pool.acquire()
+        busy = pool.acquire()
+        pool.release(idle)
+        pool.set_style("QWidget { height: ${height}px }")
+        style = "QWidget {{ height: {}px }}".format(int(busy._height))
+        assert idle.styleSheet() == busy.styleSheet() == style
+        assert pool.acquire() is idle
+        assert pool.acquire().styleSheet() == style
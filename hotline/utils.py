@@ -1,21 +1,26 @@
+from collections import deque, namedtuple
+from concurrent.futures import Future
 from contextlib import contextmanager
 from functools import partial
 
-try:
-    from Queue import Queue
-except ImportError:
-    from queue import Queue
-
+import os
+import signal
 import subprocess
 import sys
+import threading
+import traceback
 from timeit import default_timer
 
-from hotline.vendor.qtpy import QtCore, QtGui, QtWidgets
+from hotline.stream import capture
+from hotline.vendor.qtpy import QtCore, QtGui
 
 __all__ = [
     "Executor",
     "execute_in_main_thread",
     "new_process",
+    "Process",
+    "ProcessResult",
+    "run_process",
     "redirect_stream",
     "qt_sleep",
     "sleep_until",
@@ -42,74 +47,261 @@ def keys_to_string(key, modifiers):
     return "+".join([mods, key])
 
 
-def new_process(*args, **kwargs):
-    """Wraps subprocess.Popen and polls until the process returns or the
-    timeout is reached (2 seconds by default).
+ProcessResult = namedtuple(
+    "ProcessResult", "returncode stdout stderr duration timed_out cancelled"
+)
+
+
+class Process(object):
+    """Runs a subprocess and streams its output line by line.
+
+    Output is read by one thread per pipe, so a chatty process can never
+    fill a pipe and deadlock. Waiting blocks on the process instead of
+    polling it.
 
     :param args: subprocess.Popen args
+    :param on_stdout: called with each line of stdout from a reader thread
+    :param on_stderr: called with each line of stderr from a reader thread
     :param kwargs: subprocess.Popen kwargs
-    :param timeout: Number of seconds to poll process before returning
+
+    .. usage::
+
+        process = Process("ping", "localhost", on_stdout=print).start()
+        result = process.wait(timeout=5)
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.on_stdout = kwargs.pop("on_stdout", None)
+        self.on_stderr = kwargs.pop("on_stderr", None)
+
+        if sys.platform == "win32":
+            create_new_process_group = 0x00000200
+            detached_process = 0x00000008
+            creation_flags = detached_process | create_new_process_group
+            kwargs.setdefault("creationflags", creation_flags)
+        else:
+            # Own process group so cancel reaches the shell's children
+            kwargs.setdefault("start_new_session", True)
+
+        kwargs.setdefault("stdin", subprocess.PIPE)
+        kwargs.setdefault("stdout", subprocess.PIPE)
+        kwargs.setdefault("stderr", subprocess.PIPE)
+        kwargs.setdefault("shell", True)
+        kwargs.setdefault("universal_newlines", True)
+        kwargs.setdefault("errors", "replace")
+
+        self.args = args
+        self.kwargs = kwargs
+        self.popen = None
+        self.cancelled = False
+        self._stdout = []
+        self._stderr = []
+        self._readers = []
+        self._start = None
+        self._result = None
+
+    def start(self):
+        self._start = default_timer()
+        self.popen = subprocess.Popen(self.args, **self.kwargs)
+        if self.popen.stdin:
+            self.popen.stdin.close()
+
+        pipes = (
+            (self.popen.stdout, self._stdout, self.on_stdout),
+            (self.popen.stderr, self._stderr, self.on_stderr),
+        )
+        for pipe, lines, callback in pipes:
+            if pipe is None:
+                continue
+            reader = threading.Thread(target=self._read, args=(pipe, lines, callback))
+            reader.daemon = True
+            reader.start()
+            self._readers.append(reader)
+        return self
+
+    def _read(self, pipe, lines, callback):
+        with pipe:
+            for line in iter(pipe.readline, ""):
+                lines.append(line)
+                if callback:
+                    try:
+                        callback(line)
+                    except Exception:
+                        traceback.print_exc()
+
+    @property
+    def running(self):
+        return self.popen is not None and self.popen.poll() is None
+
+    def cancel(self):
+        """Kill the process"""
+
+        if not self.running:
+            return
+
+        self.cancelled = True
+        if sys.platform != "win32" and self.kwargs.get("start_new_session"):
+            try:
+                os.killpg(self.popen.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+        self.popen.kill()
+
+    def wait(self, timeout=None):
+        """Block until the process exits or timeout seconds pass.
+
+        :param timeout: Number of seconds to wait, None waits forever
+        :returns: ProcessResult or None if the timeout was reached
+        """
+
+        if self._result:
+            return self._result
+
+        try:
+            self.popen.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return
+
+        # Orphaned grandchildren may hold a pipe open after a cancel
+        for reader in self._readers:
+            reader.join(1 if self.cancelled else None)
+
+        self._result = ProcessResult(
+            returncode=self.popen.returncode,
+            stdout="".join(self._stdout),
+            stderr="".join(self._stderr),
+            duration=default_timer() - self._start,
+            timed_out=False,
+            cancelled=self.cancelled,
+        )
+        return self._result
+
+
+def run_process(*args, **kwargs):
+    """Run a process to completion, killing it when the timeout is reached.
+
+    :param args: subprocess.Popen args
+    :param kwargs: Process kwargs
+    :param timeout: Number of seconds to wait before killing the process
+    :returns: ProcessResult
+    """
+
+    timeout = kwargs.pop("timeout", None)
+    process = Process(*args, **kwargs).start()
+    result = process.wait(timeout)
+    if result is None:
+        process.cancel()
+        result = process.wait()._replace(timed_out=True, cancelled=False)
+    return result
+
+
+def new_process(*args, **kwargs):
+    """Starts a Process and waits until it returns or the timeout is
+    reached (2 seconds by default). The process keeps running after a
+    timeout.
+
+    :param args: subprocess.Popen args
+    :param kwargs: Process kwargs
+    :param timeout: Number of seconds to wait for the process
     :returns: (stdout, stderr) or None if timeout reached
     """
 
     timeout = kwargs.pop("timeout", 2)
-
-    if sys.platform == "win32":
-        create_new_process_group = 0x00000200
-        detached_process = 0x00000008
-        creation_flags = detached_process | create_new_process_group
-        kwargs.setdefault("creationflags", creation_flags)
-
-    kwargs.setdefault("stdin", subprocess.PIPE)
-    kwargs.setdefault("stdout", subprocess.PIPE)
-    kwargs.setdefault("stderr", subprocess.PIPE)
-    kwargs.setdefault("shell", True)
-
-    p = subprocess.Popen(args, **kwargs)
-    s = default_timer()
-    while default_timer() - s < timeout:
-        p.poll()
-        if p.returncode is not None:
-            break
-
-    if p.returncode is None:
+    result = Process(*args, **kwargs).start().wait(timeout)
+    if result is None:
         return
 
-    return p.stdout.read(), p.stderr.read()
+    return result.stdout, result.stderr
 
 
 @contextmanager
 def redirect_stream(stdout=None, stderr=None, stdin=None):
-    """Temporarily redirect output stream"""
+    """Temporarily redirect output stream
+
+    stdout and stderr are redirected for the calling thread only, see
+    hotline.stream.capture. stdin is replaced globally.
+    """
 
-    sys.stdout = stdout or sys.__stdout__
-    sys.stderr = stderr or sys.__stderr__
+    previous_stdin = sys.stdin
     sys.stdin = stdin or sys.__stdin__
 
     try:
-        yield
+        with capture(stdout or sys.__stdout__, stderr or sys.__stderr__):
+            yield
     finally:
-        sys.stdout = sys.__stdout__
-        sys.stderr = sys.__stderr__
-        sys.stdin = sys.__stdin__
+        sys.stdin = previous_stdin
 
 
 class Executor(QtCore.QObject):
-    """Executes functions in the main QThread"""
+    """Executes functions in the main QThread
+
+    Callbacks queued from any thread are drained together, at most one
+    queued slot invocation is pending no matter how many callbacks arrive.
+    Each call returns a concurrent.futures.Future. Don't wait on it from the
+    main thread, it will never resolve.
+    """
 
     def __init__(self):
         super(Executor, self).__init__()
-        self.queue = Queue()
+        self.queue = deque()
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._scheduled = False
 
     def execute(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return a Future for its result"""
+
+        return self._submit(None, fn, args, kwargs)
+
+    def coalesce(self, key, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) replacing a pending call with the same key.
+
+        The latest call wins, and all callers share the pending call's Future.
+        """
+
+        return self._submit(key, fn, args, kwargs)
+
+    def _submit(self, key, fn, args, kwargs):
         callback = partial(fn, *args, **kwargs)
-        self.queue.put(callback)
-        QtCore.QMetaObject.invokeMethod(self, "_execute", QtCore.Qt.QueuedConnection)
+        with self._lock:
+            if key is not None and key in self._keys:
+                entry = self._keys[key]
+                entry[1] = callback
+                return entry[0]
+
+            entry = [Future(), callback]
+            self.queue.append(entry)
+            if key is not None:
+                self._keys[key] = entry
+
+            schedule = not self._scheduled
+            self._scheduled = True
+
+        if schedule:
+            QtCore.QMetaObject.invokeMethod(
+                self, "_execute", QtCore.Qt.QueuedConnection
+            )
+        return entry[0]
 
     @QtCore.Slot()
     def _execute(self):
-        callback = self.queue.get()
-        callback()
+        with self._lock:
+            batch = self.queue
+            self.queue = deque()
+            self._keys.clear()
+            self._scheduled = False
+
+        for future, callback in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = callback()
+            except BaseException as e:
+                traceback.print_exc()
+                future.set_exception(e)
+            else:
+                future.set_result(result)
 
 
 Executor = Executor()
@@ -119,20 +311,38 @@ def execute_in_main_thread(fn, *args, **kwargs):
     """
     Convenience method for Executor.execute...Executes a function in the
     main QThread as soon as possible.
+
+    :returns: concurrent.futures.Future
     """
 
-    Executor.execute(fn, *args, **kwargs)
+    return Executor.execute(fn, *args, **kwargs)
 
 
 @contextmanager
-def event_loop(conditions=None, timeout=None, parent=None):
+def event_loop(conditions=None, timeout=None, parent=None, interval=50, signals=None):
+    """Run a nested QEventLoop when the with block exits.
+
+    The loop quits when the timeout is reached, any of the signals is
+    emitted or any of the conditions returns True. Conditions are polled
+    by a timer, so waiting costs nearly no CPU.
+
+    :param conditions: list of callables returning True or False
+    :param timeout: Number of milliseconds before the loop quits
+    :param parent: Parent QObject of the loop
+    :param interval: Number of milliseconds between condition checks
+    :param signals: list of Qt signals that quit the loop
+    """
+
     loop = QtCore.QEventLoop(parent)
 
     if timeout:
-        QtCore.QTimer.singleShot(timeout, loop.quit)
+        ttimer = QtCore.QTimer(loop)
+        ttimer.setSingleShot(True)
+        ttimer.timeout.connect(loop.quit)
+        ttimer.start(timeout)
 
     if conditions:
-        ctimer = QtCore.QTimer()
+        ctimer = QtCore.QTimer(loop)
 
         def check_conditions():
             for condition in conditions:
@@ -141,35 +351,50 @@ def event_loop(conditions=None, timeout=None, parent=None):
                     loop.quit()
 
         ctimer.timeout.connect(check_conditions)
-        ctimer.start()
+        ctimer.start(interval)
+
+    for signal in signals or []:
+        signal.connect(loop.quit)
 
     try:
         yield loop
     finally:
-        loop.exec_()
+        # Quitting before exec has no effect, so don't start a loop at all
+        if not (conditions and any(condition() for condition in conditions)):
+            loop.exec_()
+        for signal in signals or []:
+            signal.disconnect(loop.quit)
 
 
 def qt_sleep(secs=0):
-    """Non-blocking sleep for Qt"""
+    """Non-blocking sleep for Qt. Events are processed while a timer waits"""
 
-    start = default_timer()
-    app = QtWidgets.QApplication.instance()
-
-    while True:
-        app.processEvents()
-        if default_timer() - start > secs:
-            return
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(int(secs * 1000), loop.quit)
+    loop.exec_()
 
 
-def sleep_until(wake_condition, timeout=None, sleep=qt_sleep):
+def sleep_until(wake_condition, timeout=None, sleep=None, interval=0.1):
     """
     Process QApplication events until the wake_condition returns True or
     the timeout is reached...
 
     :param wake_condition: callable returning True or False
     :param timeout: Number of seconds to wait before returning
+    :param sleep: optional sleep function called between checks instead of
+        running a timer driven event loop
+    :param interval: Number of seconds between checks
     """
 
+    if wake_condition():
+        return
+
+    if sleep is None:
+        timeout = int(timeout * 1000) if timeout else None
+        with event_loop([wake_condition], timeout, interval=int(interval * 1000)):
+            pass
+        return
+
     start = default_timer()
 
     while True:
@@ -180,4 +405,4 @@ def sleep_until(wake_condition, timeout=None, sleep=qt_sleep):
         if wake_condition():
             return
 
-        sleep(0.1)
+        sleep(interval)
@@ -1,10 +1,20 @@
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
 from collections import deque
 from contextlib import contextmanager
+from time import perf_counter_ns
+from timeit import default_timer
 
+from hotline import fuzzy, metrics, task
 from hotline.anim import *
-from hotline.utils import event_loop
+from hotline.utils import Executor, event_loop, execute_in_main_thread
 from hotline.vendor.qtpy import QtCore, QtGui, QtWidgets
 
+# Shared by all CommandLists, only the latest query of each list matters
+filter_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="HotlineFilter")
+# Pulls threaded option streams, see CommandList.stream
+option_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="HotlineOptions")
+
 
 class ActiveScreen(object):
     @staticmethod
@@ -27,9 +37,152 @@ class ActiveScreen(object):
         return cls.active().center().toTuple()
 
 
-class CommandList(QtWidgets.QListWidget):
+class CommandModel(QtCore.QStringListModel):
+    """List model exposing the rows that survived the last filter.
+
+    Display strings live in Qt's string list so that layout and row counting
+    stay in C++. The fuzzy.Match for a row is only looked up when a visible
+    row is painted.
+    """
+
+    SpansRole = QtCore.Qt.UserRole + 1
+    # Most rows inserted by one insertRows call
+    insert_batch = 256
+
+    def __init__(self, parent=None):
+        super(CommandModel, self).__init__(parent)
+        self.matches = []
+
+    def set_matches(self, matches, texts=None):
+        """Set the visible rows.
+
+        :param matches: sequence of fuzzy.Match objects
+        :param texts: optional list of the matches' text, when known
+        """
+
+        self.matches = matches
+        if texts is None:
+            texts = [m.text for m in matches]
+        self.setStringList(texts)
+
+    def insert_matches(self, matches, rows):
+        """Insert rows for new matches, the other rows and the selection stay.
+
+        :param matches: sequence of fuzzy.Match objects, the updated rows
+        :param rows: ascending rows of the new matches in matches
+        """
+
+        self.matches = matches
+        i = 0
+        while i < len(rows):
+            # Insert runs of consecutive rows at once, in batches because
+            # inserting a run costs the square of its length
+            first = rows[i]
+            count = 1
+            while (
+                i + count < len(rows)
+                and rows[i + count] == first + count
+                and count < self.insert_batch
+            ):
+                count += 1
+            self.insertRows(first, count)
+            for row in range(first, first + count):
+                self.setData(self.index(row), matches[row].text)
+            i += count
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == self.SpansRole:
+            if index.isValid():
+                return self.matches[index.row()].spans
+            return
+        return super(CommandModel, self).data(index, role)
+
+
+class PreviewModel(QtCore.QStringListModel):
+    """List model reading display strings from a lazy sequence of rows.
+
+    Like CommandModel, row counting stays in C++, here with a list of
+    placeholder strings. A row's text is only read when it is painted.
+    """
+
+    def __init__(self, parent=None):
+        super(PreviewModel, self).__init__(parent)
+        self.rows = []
+
+    def set_rows(self, rows):
+        self.rows = rows
+        count = len(rows)
+        if count != self.rowCount():
+            self.setStringList([""] * count)
+        elif count:
+            # Same shape, only the visible rows are repainted
+            self.dataChanged.emit(self.index(0), self.index(count - 1))
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and index.isValid():
+            return self.rows[index.row()]
+
+
+class CommandDelegate(QtWidgets.QStyledItemDelegate):
+    """Draws items normally then underlines fuzzy matched characters."""
+
+    def paint(self, painter, option, index):
+        super(CommandDelegate, self).paint(painter, option, index)
+
+        spans = index.data(CommandModel.SpansRole)
+        if not spans:
+            return
+
+        opt = QtWidgets.QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        widget = opt.widget
+        style = widget.style() if widget else QtWidgets.QApplication.style()
+        rect = style.subElementRect(
+            QtWidgets.QStyle.SE_ItemViewItemText, opt, widget
+        )
+        margin = style.pixelMetric(QtWidgets.QStyle.PM_FocusFrameHMargin, None, widget)
+        metrics = QtGui.QFontMetrics(opt.font)
+        left = rect.left() + margin + 1
+        baseline = rect.center().y() + (metrics.ascent() - metrics.descent()) * 0.5
+        underline = int(baseline + metrics.underlinePos())
+
+        if opt.state & QtWidgets.QStyle.State_Selected:
+            color = opt.palette.color(QtGui.QPalette.HighlightedText)
+        else:
+            color = opt.palette.color(QtGui.QPalette.Text)
+
+        painter.save()
+        painter.setClipRect(rect)
+        painter.setPen(QtGui.QPen(color, max(1, metrics.lineWidth())))
+        text = opt.text
+        for start, end in spans:
+            x0 = left + metrics.horizontalAdvance(text[:start])
+            x1 = x0 + metrics.horizontalAdvance(text[start:end])
+            painter.drawLine(x0, underline, x1, underline)
+        painter.restore()
+
+
+class CommandList(QtWidgets.QListView):
     # TODO add support for icons
 
+    max_visible = 5
+    # Lists up to this size are filtered synchronously on every keystroke
+    sync_threshold = 5000
+    # Upper bound of the adaptive debounce interval in ms
+    max_debounce = 150
+    # Set False when the owner supplies already filtered items
+    filtering = True
+    # Seconds spent pulling a streamed iterator per event loop iteration
+    stream_slice = 0.01
+    # Items a threaded stream collects before handing them to the list
+    stream_chunk_size = 1000
+
     def __init__(self, items, lineedit, parent=None):
         super(CommandList, self).__init__(parent)
         self.setWindowFlags(QtCore.Qt.Window | QtCore.Qt.FramelessWindowHint)
@@ -38,83 +191,382 @@ class CommandList(QtWidgets.QListWidget):
         self.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
         self.parent = parent
         self.lineedit = lineedit
+        self.matcher = fuzzy.Matcher()
+        self._command_model = CommandModel(self)
+        self._preview_model = PreviewModel(self)
+        self._set_model(self._command_model)
+        self.setItemDelegate(CommandDelegate(self))
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
         self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
         self.setFocusPolicy(QtCore.Qt.NoFocus)
-        self.itemSelectionChanged.connect(self.parent.activateWindow)
+        self._visible_count = 0
+        self._source = None
+        self._generation = 0
+        self._pending = None
+        self._filter_time = 0
+        self._debounce = QtCore.QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.timeout.connect(self._start_filter)
+        self._keep_selection = False
+        self._stream = None
+        self._stream_id = 0
+        self._stream_buffer = deque()
+        self._stream_timer = QtCore.QTimer(self)
+        self._stream_timer.timeout.connect(self._pull_stream)
         self.items = items
 
+    def _set_model(self, model):
+        if self.model() is model:
+            return
+        selection_model = self.selectionModel()
+        self.setModel(model)
+        if selection_model:
+            selection_model.deleteLater()
+        self.selectionModel().selectionChanged.connect(self.parent.activateWindow)
+
     @property
     def items(self):
-        return (self.item(i) for i in range(self.count()))
+        return self.matcher.items
 
     @items.setter
     def items(self, value):
-        self.clear()
-        self.addItems(value)
-        self.setGeometry(self._get_geometry())
+        self.stop_stream()
+        self._cancel_filter()
+        # Reuse the keyed matcher when handed the same list again
+        if value is not self._source:
+            self._source = value
+            self.matcher.items = value
+        matches = self.matcher.match("")
+        self.set_matches(matches, matches.texts)
+
+    def extend(self, items):
+        """Append items, inserting the rows of those matching the query.
+
+        Only the new items are matched. The query is refiltered instead when
+        its results are not known yet, keeping the selected item.
+        """
+
+        self._source = None
+        text = self.lineedit.text() if self.filtering else ""
+        if self._pending is not None or self.previewing:
+            # The shown rows are not the results of text
+            extended = self.matcher.extend(items)
+        else:
+            extended = self.matcher.extend(items, text.strip(" "))
+            if extended and len(extended[0]) != self.count() + len(extended[1]):
+                extended = None
+        if extended is None:
+            if self.filtering:
+                self.request_filter(text, keep_selection=True)
+            elif not self.previewing:
+                matches = self.matcher.match("")
+                self.set_matches(matches, matches.texts)
+            return
+
+        matches, rows = extended
+        self._command_model.insert_matches(matches, rows)
+        self._visible_count = len(matches)
+        self.update_geometry()
+        if text.strip(" ") and matches and self.currentRow() < 0:
+            self.setCurrentRow(0)
+
+    @property
+    def streaming(self):
+        return self._stream is not None
+
+    def stream(self, source, threaded=False):
+        """Replace the items with those produced by source as they arrive.
+
+        Rows show up as soon as the first chunk is ready and the list is
+        refiltered as more arrive, so the user can type while it streams.
+
+        Iterators are pulled on the main thread a slice at a time between
+        events by default, because scene APIs like maya.cmds are not thread
+        safe. Pass threaded=True to pull on a worker thread instead. A Future
+        streams its result once it resolves.
+
+        :param source: iterator, generator or Future of a list or iterator
+        :param threaded: pull iterators on a worker thread
+        """
+
+        self.items = []
+        self._stream_id += 1
+        stream_id = self._stream_id
+        self._stream = source
+
+        if isinstance(source, Future):
+            source.add_done_callback(
+                lambda future: Executor.execute(
+                    self._stream_resolved, stream_id, future, threaded
+                )
+            )
+        elif threaded:
+            option_pool.submit(self._stream_job, stream_id, iter(source))
+        else:
+            self._stream = iter(source)
+            self._stream_timer.start(0)
+
+    def stop_stream(self):
+        """Stop streaming, keeping the items that already arrived"""
+
+        self._stream_id += 1
+        self._stream = None
+        self._stream_timer.stop()
+        self._stream_buffer.clear()
+
+    def _stream_resolved(self, stream_id, future, threaded):
+        if stream_id != self._stream_id:
+            return
+        if future.cancelled() or future.exception():
+            self.stop_stream()
+            return
+        self.stream(future.result() or [], threaded)
+
+    def _pull_stream(self):
+        deadline = default_timer() + self.stream_slice
+        chunk = []
+        try:
+            for item in self._stream:
+                chunk.append(item)
+                if default_timer() > deadline:
+                    break
+            else:
+                self.stop_stream()
+        except Exception:
+            traceback.print_exc()
+            self.stop_stream()
+        if chunk:
+            self.extend(chunk)
+
+    def _stream_job(self, stream_id, iterator):
+        def flush(chunk):
+            self._stream_buffer.append((stream_id, chunk))
+            Executor.coalesce((id(self), "stream"), self._drain_stream)
+
+        chunk = []
+        try:
+            for item in iterator:
+                if stream_id != self._stream_id:
+                    return
+                chunk.append(item)
+                if len(chunk) >= self.stream_chunk_size:
+                    flush(chunk)
+                    chunk = []
+        except Exception:
+            traceback.print_exc()
+        flush(chunk)
+        flush(None)
+
+    def _drain_stream(self):
+        items = []
+        done = False
+        while self._stream_buffer:
+            stream_id, chunk = self._stream_buffer.popleft()
+            if stream_id != self._stream_id:
+                continue
+            if chunk is None:
+                done = True
+            else:
+                items.extend(chunk)
+        if done:
+            self.stop_stream()
+        if items:
+            self.extend(items)
+
+    @property
+    def previewing(self):
+        return self.model() is self._preview_model
+
+    def preview(self, rows):
+        """Show rows in place of the items, unfiltered and unselectable.
+
+        Rows are any sequence supporting len and indexing, only the visible
+        ones are read. Setting items ends the preview.
+
+        :param rows: sequence of display strings
+        """
+
+        self.stop_stream()
+        self._cancel_filter()
+        self._preview_model.set_rows(rows)
+        self._set_model(self._preview_model)
+        self._visible_count = len(rows)
+        self.update_geometry()
+
+    @property
+    def boosts(self):
+        """Dict of item to score bonus, typically from usage statistics"""
+        return self.matcher.boosts
+
+    @boosts.setter
+    def boosts(self, value):
+        boosts = self.matcher.boosts
+        self.matcher.boosts = value
+        if self.matcher.boosts is not boosts:
+            self._cancel_filter()
+
+    @property
+    def matches(self):
+        """Ordered fuzzy.Match objects of the visible rows"""
+        return self._command_model.matches
+
+    def set_matches(self, matches, texts=None):
+        self._command_model.set_matches(matches, texts)
+        self._set_model(self._command_model)
+        self._visible_count = len(matches)
+        self.update_geometry()
+
+    def count(self):
+        return self._visible_count
 
     def visible_count(self):
-        count = 0
-        for item in self.items:
-            if not item.isHidden():
-                count += 1
-        return count
+        return self._visible_count
+
+    def currentRow(self):
+        index = self.currentIndex()
+        if index.isValid():
+            return index.row()
+        return -1
+
+    def setCurrentRow(self, row):
+        if row < 0:
+            self.clearSelection()
+            self.setCurrentIndex(QtCore.QModelIndex())
+            return
+        self.setCurrentIndex(self.model().index(row))
+
+    def selected_text(self):
+        if self.previewing:
+            return
+        indexes = self.selectionModel().selectedIndexes()
+        if indexes:
+            return indexes[0].data()
 
     def select_next(self):
-        row = self.currentRow()
-        while True:
-            row += 1
-            if row > self.count() - 1:
-                return
-            if self.item(row).isHidden():
-                continue
+        row = self.currentRow() + 1
+        if row < self._visible_count:
             self.setCurrentRow(row)
-            return
 
     def select_prev(self):
-        row = self.currentRow()
-        while True:
-            row -= 1
-            if row < 0:
-                self.setCurrentRow(row)
-                return
-            if self.item(row).isHidden():
-                continue
-            self.setCurrentRow(row)
-            return
+        self.setCurrentRow(self.currentRow() - 1)
 
     def is_match(self, letters, item):
-        letters = deque(letters.lower())
-        l = letters.popleft()
-        for char in item.lower():
-            if char == l:
-                try:
-                    l = letters.popleft()
-                except IndexError:
-                    return True
-        return False
-
-    def filter(self, text):
+        return fuzzy.score(letters, item) is not None
+
+    def filter(self, text, keep_selection=False):
+        """Filter the list synchronously"""
+
+        self._cancel_filter()
+        self._keep_selection = keep_selection
+        if not self.filtering or self.previewing:
+            return
         text = text.strip(" ")
-        if not text:
-            for item in self.items:
-                item.setHidden(False)
-            self.setCurrentRow(-1)
+        start = perf_counter_ns()
+        matches = self.matcher.match(text)
+        self._apply_filter(text, matches, perf_counter_ns() - start)
+
+    def request_filter(self, text, keep_selection=False):
+        """Filter the list as the user types.
+
+        Small lists and empty queries are filtered immediately. Larger lists
+        are debounced by roughly the cost of the previous filter, then scored
+        on a worker thread. Each new request cancels the previous one.
+        Nothing is filtered while filtering is False or previewing.
+        """
+
+        if not self.filtering or self.previewing:
+            return
+        if not text.strip(" ") or len(self.matcher) <= self.sync_threshold:
+            self.filter(text, keep_selection)
+            return
+
+        self._keep_selection = keep_selection
+        self._generation += 1
+        self._pending = text
+        interval = min(int(self._filter_time * 1000), self.max_debounce)
+        self._debounce.start(interval)
+
+    def flush(self):
+        """Synchronously apply a requested filter that has not finished"""
+
+        if self._pending is not None:
+            self.filter(self._pending, self._keep_selection)
+
+    def _cancel_filter(self):
+        self._generation += 1
+        self._pending = None
+        self._debounce.stop()
+
+    def _start_filter(self):
+        if self._pending is None:
+            return
+        filter_pool.submit(
+            self._filter_job,
+            self.matcher,
+            self._pending.strip(" "),
+            self._generation,
+        )
+
+    def _filter_job(self, matcher, text, generation):
+        def cancelled():
+            return generation != self._generation
+
+        try:
+            start = perf_counter_ns()
+            matches = matcher.match(text, cancelled=cancelled)
+            if matches is None:
+                return
+            duration = perf_counter_ns() - start
+            execute_in_main_thread(
+                self._finish_filter, text, generation, matches, duration
+            )
+        except Exception:
+            traceback.print_exc()
+
+    def _finish_filter(self, text, generation, matches, duration):
+        if generation != self._generation:
+            return
+        self._pending = None
+        self._apply_filter(text, matches, duration)
+
+    def _apply_filter(self, text, matches, duration):
+        metrics.registry.observe("filter", duration)
+        # Exponential moving average drives the debounce interval
+        self._filter_time = self._filter_time * 0.5 + duration * 0.5e-9
+
+        selected = None
+        row = self.currentRow()
+        if self._keep_selection and 0 <= row < len(self.matches):
+            selected = self.matches[row].index
+
+        if text:
+            self.set_matches(matches)
         else:
-            best_match = -1
-            for i, item in enumerate(self.items):
-                match = self.is_match(text, item.text())
-                if match and best_match < 0:
-                    best_match = i
-                elif text == item.text():
-                    best_match = i
-                item.setHidden(not match)
-            self.setCurrentRow(best_match)
-
-        self.setGeometry(self._get_geometry())
+            self.set_matches(matches, matches.texts)
+
+        row = -1
+        if selected is not None:
+            # Find the selected item, its row moves as items arrive
+            row = next(
+                (row for row, m in enumerate(matches) if m.index == selected), -1
+            )
+        if row >= 0:
+            self.setCurrentRow(row)
+        elif text and matches:
+            self.setCurrentRow(0)
+        else:
+            self.setCurrentRow(-1)
+
+    def update_geometry(self):
+        """Resize to fit the visible rows, skipping redundant resizes"""
+
+        rect = self._get_geometry()
+        if rect != self.geometry():
+            self.setGeometry(rect)
 
     def _get_geometry(self):
-        visible_count = self.visible_count()
+        visible_count = self._visible_count
         if not visible_count:
             return QtCore.QRect(-1, -1, 0, 0)
 
@@ -123,7 +575,7 @@ class CommandList(QtWidgets.QListWidget):
         width = self.parent.width()
         left = pos.x() - width + 1
         top = pos.y() - 2
-        height = self.parent._height * min(visible_count, 5)
+        height = self.parent._height * min(visible_count, self.max_visible)
         return QtCore.QRect(left, top, width, height)
 
     def show(self):
@@ -132,22 +584,85 @@ class CommandList(QtWidgets.QListWidget):
 
 
 class Console(QtWidgets.QDialog):
-    def __init__(self, parent=None):
+    # Lines of scrollback to keep
+    max_blocks = 10000
+    # Milliseconds between flushes of buffered output
+    flush_interval = 33
+
+    def __init__(self, parent=None, max_blocks=None):
         super(Console, self).__init__(parent)
         self.setWindowTitle("Hotline Console")
         self.setAttribute(QtCore.Qt.WA_ShowWithoutActivating)
         self.parent = parent
-        self.output = QtWidgets.QTextEdit(self)
+        self.output = QtWidgets.QPlainTextEdit(self)
         self.output.setReadOnly(True)
+        self.output.setUndoRedoEnabled(False)
+        self.output.setMaximumBlockCount(max_blocks or self.max_blocks)
         self.layout = QtWidgets.QVBoxLayout(self)
         self.layout.addWidget(self.output)
         self.setLayout(self.layout)
 
-    def write(self, message):
-        self.output.moveCursor(QtGui.QTextCursor.End)
-        self.output.insertPlainText(message)
-        self.output.moveCursor(QtGui.QTextCursor.End)
-        self.output.repaint()
+        self._buffer = deque()
+        self._tag = None
+        self._line_start = True
+        self._flush_pending = False
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def write(self, message, tag=None):
+        """Buffer message for the next flush. Safe to call from any thread.
+
+        :param message: str or object converted with str when flushed
+        :param tag: optional tag, a header line is written when it changes
+        """
+
+        self._buffer.append((tag, message))
+        if not self._flush_pending:
+            self._flush_pending = True
+            Executor.coalesce(self._flush_timer, self._schedule_flush)
+
+    def _schedule_flush(self):
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(self.flush_interval)
+
+    def flush(self):
+        """Append all buffered output to the console in one edit"""
+
+        self._flush_pending = False
+        chunks = []
+        line_start = self._line_start
+        while self._buffer:
+            tag, message = self._buffer.popleft()
+            if tag != self._tag:
+                self._tag = tag
+                if tag is not None:
+                    if not line_start:
+                        chunks.append("\n")
+                    chunks.append("# {}\n".format(tag))
+                    line_start = True
+            if not isinstance(message, str):
+                message = str(message)
+            if message:
+                chunks.append(message)
+                line_start = message.endswith("\n")
+        if not chunks:
+            return
+        self._line_start = line_start
+        text = "".join(chunks)
+
+        # Lines beyond the block limit would be dropped right away
+        limit = self.output.maximumBlockCount()
+        if limit > 0 and text.count("\n") >= limit:
+            text = "\n".join(text.split("\n")[-limit:])
+
+        scrollbar = self.output.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        cursor = QtGui.QTextCursor(self.output.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
 
     def show(self):
         if self.isVisible():
@@ -221,8 +736,8 @@ class Dialog(QtWidgets.QDialog):
             QtWidgets.QSizePolicy.Expanding,
         )
         self.commandlist = CommandList([], self.input_field, self)
-        self.commandlist.itemClicked.connect(self.accept)
-        self.input_field.textChanged.connect(self.commandlist.filter)
+        self.commandlist.clicked.connect(self.accept)
+        self.input_field.textChanged.connect(self.commandlist.request_filter)
         self.input_field.focusOut.connect(self.reject)
 
         self._wrapper = QtWidgets.QWidget(parent=self)
@@ -263,6 +778,10 @@ class Dialog(QtWidgets.QDialog):
         self.hk_ctrl_up.setKey("Ctrl+Up")
         self.hk_ctrl_dn = QtWidgets.QShortcut(self)
         self.hk_ctrl_dn.setKey("Ctrl+Down")
+        self.hk_ctrl_r = QtWidgets.QShortcut(self)
+        self.hk_ctrl_r.setKey("Ctrl+R")
+        self.hk_ctrl_shift_c = QtWidgets.QShortcut(self)
+        self.hk_ctrl_shift_c.setKey("Ctrl+Shift+C")
         self.hk_alt_f4 = QtWidgets.QShortcut(self)
         self.hk_tab = QtWidgets.QShortcut(self)
         self.hk_tab.setKey("Tab")
@@ -319,9 +838,9 @@ class Dialog(QtWidgets.QDialog):
             raise ValueError('position must be "center" or "top" not ' + str(value))
 
     def text(self):
-        item = self.commandlist.selectedItems()
-        if item:
-            return item[0].text()
+        text = self.commandlist.selected_text()
+        if text is not None:
+            return text
         return self.input_field.text()
 
     def _start_alt_f4_timer(self):
@@ -333,6 +852,7 @@ class Dialog(QtWidgets.QDialog):
         QtCore.QTimer.singleShot(500, _finished)
 
     def accept(self):
+        self.commandlist.flush()
         self.accepted.emit()
 
     def reject(self):
@@ -403,13 +923,13 @@ class Dialog(QtWidgets.QDialog):
 
     def fade_in_group(self, pos):
         self.setGeometry(pos[0], pos[1], self._width, self._height)
-        self.commandlist.setGeometry(self.commandlist._get_geometry())
+        self.commandlist.update_geometry()
         group = parallel_group(self, fade_in(self), fade_in(self.commandlist))
         return group
 
     def default_show(self, pos):
         self.setGeometry(pos[0], pos[1], self._width, self._height)
-        self.commandlist.setGeometry(self.commandlist._get_geometry())
+        self.commandlist.update_geometry()
 
     def set_style(self, style):
         _style = style.replace("${height}", str(int(self._height)))
@@ -438,9 +958,50 @@ class Dialog(QtWidgets.QDialog):
 
             self.accepted.connect(on_accept)
             self.rejected.connect(on_reject)
+        self.accepted.disconnect(on_accept)
+        self.rejected.disconnect(on_reject)
         self.force_hide()
         return loop.result
 
+    def ask(self, anim_type=None, lefttop=None):
+        """Show the Dialog and return a Future of the input text.
+
+        The Future resolves to None when the Dialog is rejected. Unlike exec_
+        this returns immediately, so waiting on input costs no nested event
+        loop.
+        """
+
+        future = task.Future()
+
+        def on_accept():
+            if not future.done():
+                future.set_result(self.text())
+
+        def on_reject():
+            if not future.done():
+                future.set_result(None)
+
+        def on_done(future):
+            self.accepted.disconnect(on_accept)
+            self.rejected.disconnect(on_reject)
+            self.force_hide()
+
+        self.accepted.connect(on_accept)
+        self.rejected.connect(on_reject)
+        future.add_done_callback(on_done)
+        self.show(anim_type, lefttop)
+        return future
+
+    def reset(self):
+        """Return to a freshly built state so the Dialog can be reused"""
+
+        self.force_hide()
+        self.pinned = False
+        self.commandlist.filtering = True
+        self.commandlist.items = []
+        self.input_field.clear()
+        self.input_field.setPlaceholderText("")
+
     def activate(self):
         self.raise_()
         self.activateWindow()
@@ -456,9 +1017,69 @@ class Dialog(QtWidgets.QDialog):
         lefttop = lefttop or self.get_position()
         anim_type = anim_type or self.animation
         group = getattr(self, anim_type + "_group", None)
+        start = perf_counter_ns()
         if group:
             group = group(lefttop)
             group.finished.connect(self.activate)
+            group.finished.connect(
+                lambda: metrics.registry.observe("show", perf_counter_ns() - start)
+            )
             group.start(group.DeletionPolicy.DeleteWhenStopped)
         else:
-            self.default_show()
+            self.default_show(lefttop)
+            metrics.registry.observe("show", perf_counter_ns() - start)
+
+
+class DialogPool(object):
+    """Pre-built, pre-styled input Dialogs that are reset and reused.
+
+    acquire hands out an idle Dialog and only builds one when none are idle.
+    release resets a Dialog and keeps up to size of them, deleting the rest.
+
+    :param parent: parent widget of the Dialogs
+    :param style: stylesheet applied when a Dialog is built
+    :param size: number of idle Dialogs kept
+    """
+
+    def __init__(self, parent=None, style=None, size=2):
+        self.parent = parent
+        self.style = style
+        self.size = size
+        self._idle = []
+        self._busy = set()
+
+    def _build(self):
+        dialog = Dialog(self.parent)
+        if self.style:
+            dialog.set_style(self.style)
+        return dialog
+
+    def warm(self):
+        """Build idle Dialogs from the event loop, one per iteration"""
+
+        QtCore.QTimer.singleShot(0, self._warm)
+
+    def _warm(self):
+        if len(self._idle) < self.size:
+            self._idle.append(self._build())
+            self.warm()
+
+    def acquire(self):
+        dialog = self._idle.pop() if self._idle else self._build()
+        self._busy.add(dialog)
+        return dialog
+
+    def release(self, dialog):
+        self._busy.discard(dialog)
+        dialog.reset()
+        if len(self._idle) < self.size:
+            self._idle.append(dialog)
+        else:
+            dialog.deleteLater()
+
+    def set_style(self, style):
+        """Restyle the idle and acquired Dialogs and those built later"""
+
+        self.style = style
+        for dialog in self._idle + list(self._busy):
+            dialog.set_style(style)